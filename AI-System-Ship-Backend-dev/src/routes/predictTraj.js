@@ -5,6 +5,106 @@ const path = require('path');
 print previous point
 */
 
+// 常駐預測服務 (trajectoryPrediction/predict_server.py)，連不上時退回 execFile
+const PREDICT_SERVER_URL = process.env.PREDICT_SERVER_URL || 'http://127.0.0.1:8765';
+const PREDICT_SERVER_TIMEOUT_MS = Number(process.env.PREDICT_SERVER_TIMEOUT_MS || 30000);
+// 批次預先計算的結果 (trajectoryPrediction/precompute_predictions.py)，超過此時間視為過期
+const PRECOMPUTED_MAX_AGE_MS = Number(process.env.PRECOMPUTED_MAX_AGE_MS || 5 * 60 * 1000);
+// 預測服務目前的 model_version 快取時間 (/reload 或切換 backend 後最多延遲這麼久)
+const SERVING_VERSION_TTL_MS = Number(process.env.SERVING_VERSION_TTL_MS || 5000);
+
+let servingVersion = { value: null, checkedAt: 0 };
+
+async function servingModelVersion() {
+  // model_version of the running predict_server; null when it is not reachable
+  if (Date.now() - servingVersion.checkedAt < SERVING_VERSION_TTL_MS) {
+    return servingVersion.value;
+  }
+  let value = null;
+  try {
+    const res = await fetch(`${PREDICT_SERVER_URL}/health`, { signal: AbortSignal.timeout(2000) });
+    if (res.ok) {
+      value = (await res.json()).model_version || null;
+    }
+  } catch (e) {
+    value = null;
+  }
+  servingVersion = { value, checkedAt: Date.now() };
+  return value;
+}
+
+async function predictViaPrecomputed(fastify, mmsi) {
+  const col = fastify.mongo.client.db('ais_data_test').collection('vesselPrediction');
+  // Only predictions of the model predict_server serves now; without a server
+  // execFile loads the same on-disk model as precompute_predictions.py
+  const version = await servingModelVersion();
+  const query = version === null ? { mmsi: String(mmsi) } : { mmsi: String(mmsi), model_version: version };
+  const doc = await col.findOne(query);
+  if (!doc || Date.now() - new Date(doc.predicted_at).getTime() > PRECOMPUTED_MAX_AGE_MS) {
+    return null;
+  }
+  return doc.prediction;
+}
+
+async function predictViaServer(mmsi) {
+  const url = `${PREDICT_SERVER_URL}/predict?mmsi=${encodeURIComponent(mmsi)}`;
+  let res;
+  try {
+    res = await fetch(url, { signal: AbortSignal.timeout(PREDICT_SERVER_TIMEOUT_MS) });
+  } catch (e) {
+    // Server not running: let the caller fall back to execFile
+    return null;
+  }
+  // Only our server answers with JSON; a proxy error page (502, HTML) or a
+  // broken body means it is unavailable, so fall back to execFile too
+  const contentType = res.headers.get('content-type') || '';
+  if (!contentType.includes('application/json')) {
+    return null;
+  }
+  let body;
+  try {
+    body = await res.json();
+  } catch (e) {
+    return null;
+  }
+  if (!res.ok) {
+    throw {
+      type: "server",
+      detail: body.error || `HTTP ${res.status}`
+    };
+  }
+  return body.prediction;
+}
+
+function predictViaExecFile(mmsi) {
+  const scriptPath = path.resolve(__dirname, '../../trajectoryPrediction/predict_traj.py');
+  const env = { ...process.env, MMSI: String(mmsi) };
+
+  const pythonPath = path.resolve(__dirname, '../../trajectoryPrediction/.venv/bin/python');
+  return new Promise((resolve, reject) => {
+    execFile(pythonPath, [scriptPath], { env }, (err, stdout, stderr) => {
+      if (err) {
+        return reject({
+          type: "exec",
+          detail: stderr || String(err)
+        });
+      }
+
+      // Expect a single line: "Prediction [lat, lon, speed, course]: [...]"
+      const text = stdout.trim();
+      try {
+        const pred = JSON.parse(text);
+        return resolve(pred);
+      } catch (e) {
+        return reject({
+          type: "json",
+          detail: text
+        });
+      }
+    });
+  });
+}
+
 async function predictTrajRoutes(fastify) {
   fastify.get('/predictTraj', async (request, reply) => {
     const { mmsi } = request.query;
@@ -12,32 +112,13 @@ async function predictTrajRoutes(fastify) {
       return reply.status(400).send({ error: "Missing mmsi" });
     }
 
-    const scriptPath = path.resolve(__dirname, '../../trajectoryPrediction/predict_traj.py');
-    const env = { ...process.env, MMSI: String(mmsi) };
-
-    const pythonPath = path.resolve(__dirname, '../../trajectoryPrediction/.venv/bin/python');
-    const result = await new Promise((resolve, reject) => {
-      execFile(pythonPath, [scriptPath], { env }, (err, stdout, stderr) => {
-        if (err) {
-          return reject({
-            type: "exec",
-            detail: stderr || String(err)
-          });
-        }
-
-        // Expect a single line: "Prediction [lat, lon, speed, course]: [...]"
-        const text = stdout.trim();
-        try {
-          const pred = JSON.parse(text);
-          return resolve(pred);
-        } catch (e) {
-          return reject({
-            type: "json",
-            detail: text
-          });
-        }
-      });
-    });
+    let result = await predictViaPrecomputed(fastify, mmsi);
+    if (result === null) {
+      result = await predictViaServer(mmsi);
+    }
+    if (result === null) {
+      result = await predictViaExecFile(mmsi);
+    }
 
     return reply.send({ mmsi, prediction: result });
   });
@@ -2,17 +2,28 @@ const { vesselTrackSchema } = require('../schemas/vesselTrackSchema');
 
 async function vesselTrackRoutes(fastify) {
   fastify.get('/vesselTrack', { schema: vesselTrackSchema }, async (request, reply) => {
-    const { mmsi } = request.query;
+    const { mmsi, since } = request.query;
     const key = mmsi;
 
     const db_ais = fastify.mongo.client.db('ais_data_test');
     const col_ais = db_ais.collection('Taiwan');
 
+    // since: 只回傳比此時間更新的點 (增量同步用)
+    const query = { 'properties.MMSI': key };
+    if (since) {
+      query['properties.Record_Time'] = { $gt: new Date(since) };
+    }
+
     const vesselTrack = await col_ais
-      .find({ 'properties.MMSI': key })
+      .find(query)
       .sort({ 'properties.Record_Time': -1 })
       .toArray();
 
+    // 增量查詢沒有新點是正常情況
+    if (since && vesselTrack.length === 0) {
+      return reply.send([]);
+    }
+
     // 如果 AIS 資料不存在
     if (vesselTrack.length === 0) {
       return reply.status(404).send({ error: "Vessel not found in AIS database" });
@@ -6,6 +6,11 @@ const vesselTrackQuery = {
     mmsi: {
       type: 'string',
       description: '海事移動服務標識'
+    },
+    since: {
+      type: 'string',
+      format: 'date-time',
+      description: '只回傳此時間之後的軌跡點'
     }
   }
 };
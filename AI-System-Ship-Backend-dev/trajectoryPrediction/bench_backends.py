@@ -0,0 +1,65 @@
+"""
+CPU latency/throughput of the model backends (eager, TorchScript, ONNX)
+for batch sizes 1..1024. Run export_model.py first for the exported ones.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import torch
+
+# Ensure project root is on sys.path for local imports
+PROJECT_ROOT = Path(__file__).resolve().parents[0]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from config import model_config
+from model_backends import BACKENDS
+from predict_traj import MODEL_PATH, load_model
+
+BATCH_SIZES = (1, 8, 64, 256, 1024)
+
+
+def bench(model, batch_size, repeats, warmup=2):
+    x = torch.randn(batch_size, model_config.SEQ_LEN, model_config.MODEL_INPUT_SIZE)
+    samples = []
+    with torch.no_grad():
+        for i in range(warmup + repeats):
+            t0 = time.perf_counter()
+            model(x)
+            if i >= warmup:
+                samples.append(time.perf_counter() - t0)
+    return np.array(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model-path", default=MODEL_PATH)
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=list(BATCH_SIZES))
+    parser.add_argument("--repeats", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"torch threads: {torch.get_num_threads()}")
+    print("backend | batch | p50 ms | p95 ms | samples/s")
+    for backend in args.backends:
+        try:
+            model = load_model(device=torch.device("cpu"), model_path=args.model_path, backend=backend)
+        except (FileNotFoundError, ImportError) as e:
+            print(f"{backend}: skipped ({e})")
+            continue
+        for batch_size in args.batch_sizes:
+            # Fewer repeats for the big batches to keep the run short
+            repeats = max(3, args.repeats * 64 // max(batch_size, 64))
+            s = bench(model, batch_size, repeats) * 1000.0
+            p50 = np.percentile(s, 50)
+            print(
+                f"{backend} | {batch_size} | {p50:.2f} | {np.percentile(s, 95):.2f} | "
+                f"{batch_size / (p50 / 1000.0):.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Client-side decode cost of the vesselPosition loaders, without a server:
+synthetic snapshots (every field of vessel_position_format.md, as strings)
+are BSON-encoded the way each loader receives them, then decoded into
+track columns. Each loader runs in a fresh process so peak RSS is its own.
+
+    records  full snapshots -> dicts -> record list (load_records_from_db)
+    points   one projected row per point -> dicts (load_track_columns_from_db)
+    raw      projected snapshots as RawBSONDocument (load_raw_track_columns_from_db)
+
+    python bench_bson_decode.py --snapshots 200 --vessels 2000
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import bson
+import numpy as np
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+
+# Ensure project root is on sys.path for local imports
+PROJECT_ROOT = Path(__file__).resolve().parents[0]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from marineTraffic import preprocess as pp
+
+LOADERS = ("records", "points", "raw")
+POINT_TEMPLATE = {
+    "MMSI": "636093174", "IMO": "9525936", "SHIP_ID": "1474", "LAT": "12.645331", "LON": "111.34153",
+    "SPEED": "148", "HEADING": "31", "COURSE": "30", "STATUS": "0", "TIMESTAMP": "2026-02-06T08:53:11",
+    "DSRC": "ROAM", "UTC_SECONDS": "10", "MARKET": "CONTAINER SHIPS", "SHIPNAME": "JEBEL ALI",
+    "SHIPTYPE": "70", "CALLSIGN": "5LLI4", "FLAG": "LR", "LENGTH": "366.01999", "WIDTH": "51.200001",
+    "GRT": "141077", "DWT": "145149", "DRAUGHT": "115", "YEAR_BUILT": "2012", "SHIP_COUNTRY": "LIBERIA",
+    "SHIP_CLASS": "NEW PANAMAX", "ROT": "3", "TYPE_NAME": "Container Ship", "AIS_TYPE_SUMMARY": "Cargo",
+    "DESTINATION": "CNQIN", "ETA": "2026-02-11T12:00:00", "L_FORE": "147", "W_LEFT": "10",
+    "LAST_PORT": "SINGAPORE", "LAST_PORT_TIME": "2026-02-03T20:53:00", "LAST_PORT_ID": "290",
+    "LAST_PORT_UNLOCODE": "SGSIN", "LAST_PORT_COUNTRY": "SG", "CURRENT_PORT": None, "CURRENT_PORT_ID": None,
+    "CURRENT_PORT_UNLOCODE": None, "CURRENT_PORT_COUNTRY": None, "NEXT_PORT_ID": "2344",
+    "NEXT_PORT_UNLOCODE": "CNQZH", "NEXT_PORT_NAME": "QINZHOU", "NEXT_PORT_COUNTRY": "CN",
+    "ETA_CALC": "2026-02-08T07:16:00", "ETA_UPDATED": "2026-02-06T08:26:00", "DISTANCE_TO_GO": "636",
+    "DISTANCE_TRAVELLED": "831", "AVG_SPEED": "13.6", "MAX_SPEED": "16.299999",
+}
+
+
+def write_inputs(out_dir, snapshots, vessels):
+    """BSON streams as each loader's cursor would receive them."""
+    rng = np.random.default_rng(0)
+    lat0 = rng.uniform(-60, 60, vessels)
+    lon0 = rng.uniform(-170, 170, vessels)
+    keys = pp.RAW_POINT_FIELDS
+    files = {name: open(Path(out_dir) / f"{name}.bson", "wb") for name in LOADERS}
+    try:
+        for snap in range(snapshots):
+            data = []
+            for v in range(vessels):
+                point = dict(POINT_TEMPLATE)
+                point["MMSI"] = str(412000000 + v)
+                point["LAT"] = f"{lat0[v] + snap * 1e-3:.6f}"
+                point["LON"] = f"{lon0[v] + snap * 1e-3:.6f}"
+                point["TIMESTAMP"] = f"2026-02-06T{snap // 60 % 24:02d}:{snap % 60:02d}:00"
+                data.append(point)
+            files["records"].write(bson.encode({"data": data}))
+            files["raw"].write(bson.encode({"data": [{k: p[k] for k in keys if k in p} for p in data]}))
+            for p in data:
+                # build_point_pipeline's $project output
+                files["points"].write(bson.encode({
+                    "DOC_ID": snap, "MMSI": p["MMSI"], "LAT": p["LAT"], "LON": p["LON"], "SPEED": p["SPEED"],
+                    "COURSE": p["COURSE"], "TIMESTAMP": p["TIMESTAMP"], "SHIPTYPE": p["SHIPTYPE"],
+                }))
+    finally:
+        for f in files.values():
+            f.close()
+
+
+def run_loader(name, path):
+    # Child process: decode one stream, report time and peak RSS growth
+    data = Path(path).read_bytes()
+    base_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    t0 = time.perf_counter()
+    if name == "records":
+        records = []
+        for doc in bson.decode_iter(data):
+            records.extend(doc.get("data") or [])
+        n = len(records)
+    elif name == "points":
+        columns, _ = pp._point_columns_from_cursor(bson.decode_iter(data))
+        n = columns["t"].shape[0]
+    else:
+        docs = bson.decode_iter(data, codec_options=CodecOptions(document_class=RawBSONDocument))
+        columns, _ = pp._raw_columns_from_cursor(docs)
+        n = columns["t"].shape[0]
+    elapsed = time.perf_counter() - t0
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"loader": name, "points": n, "seconds": elapsed, "bytes": len(data), "peak_rss_mb": (peak_kb - base_kb) / 1024}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Decode time and peak RSS of the vesselPosition loaders.")
+    parser.add_argument("--snapshots", type=int, default=200)
+    parser.add_argument("--vessels", type=int, default=2000)
+    parser.add_argument("--run", nargs=2, metavar=("LOADER", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.run:
+        run_loader(*args.run)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        write_inputs(tmp, args.snapshots, args.vessels)
+        results = []
+        for name in LOADERS:
+            out = subprocess.run(
+                [sys.executable, __file__, "--run", name, str(Path(tmp) / f"{name}.bson")],
+                check=True, capture_output=True, text=True,
+            )
+            results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    print(f"BSON decode compare ({args.snapshots} snapshots x {args.vessels} points)")
+    print("| loader | input MB | decode s | points/s | peak RSS growth MB |")
+    print("| --- | --- | --- | --- | --- |")
+    for r in results:
+        print(
+            f"| {r['loader']} | {r['bytes'] / 1e6:.1f} | {r['seconds']:.2f} | "
+            f"{r['points'] / r['seconds']:.0f} | {r['peak_rss_mb']:.0f} |"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Compare the two DB load modes of marineTraffic/preprocess.py on a synthetic
+vesselPosition collection: "points" (one cursor row per AIS point, cast in
+Python), "grouped" ($convert/$sort/$group by MMSI in MongoDB) and "raw"
+(projected snapshots read as RawBSONDocument), and
+with --workers the partitioned parallel read (load_track_columns_partitioned)
+at each worker count.
+
+Needs a MongoDB you can write to; the synthetic snapshots go to a scratch
+database that is dropped afterwards (--keep to reuse it):
+
+    python bench_db_load.py --mongo-url mongodb://127.0.0.1:27017 --vessels 2000 --snapshots 120
+    python bench_db_load.py --workers 1 2 4 8
+"""
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import numpy as np
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+
+# Ensure project root is on sys.path for local imports
+PROJECT_ROOT = Path(__file__).resolve().parents[0]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import database
+from marineTraffic import preprocess as pp
+
+
+def seed_snapshots(col, vessels, snapshots, timespan):
+    """One document per poll, like vesselPosition.py: each holds every
+    vessel's points from the last `timespan` minutes, as strings."""
+    t0 = datetime(2026, 2, 6, tzinfo=timezone.utc)
+    rng = np.random.default_rng(0)
+    lat0 = rng.uniform(-60, 60, vessels)
+    lon0 = rng.uniform(-170, 170, vessels)
+    col.drop()
+    for snap in range(snapshots):
+        data = []
+        for k in range(max(0, snap - timespan + 1), snap + 1):
+            ts = (t0 + timedelta(minutes=k)).strftime("%Y-%m-%dT%H:%M:%S")
+            for v in range(vessels):
+                data.append({
+                    "MMSI": str(412000000 + v),
+                    "LAT": f"{lat0[v] + k * 1e-3:.6f}",
+                    "LON": f"{lon0[v] + k * 1e-3:.6f}",
+                    "SPEED": str(100 + v % 50),
+                    "COURSE": str((v + k) % 360),
+                    "TIMESTAMP": ts,
+                    "SHIPTYPE": pp.SHIPTYPE_FILTER or "70",
+                })
+        col.insert_one({"fetched_at": (t0 + timedelta(minutes=snap)).isoformat(), "data": data})
+
+
+def result_bytes(col, pipeline):
+    # BSON bytes the cursor returns, without decoding into dicts
+    raw = col.with_options(codec_options=CodecOptions(document_class=RawBSONDocument))
+    return sum(len(doc.raw) for doc in raw.aggregate(pipeline, allowDiskUse=True, batchSize=pp.DB_CURSOR_BATCH_SIZE))
+
+
+def same_tracks(a, b):
+    a, _, off_a = pp.sort_track_columns(a)
+    b, _, off_b = pp.sort_track_columns(b)
+    return np.array_equal(off_a, off_b) and all(np.array_equal(a[name], b[name]) for name in pp.TRACK_COLUMNS)
+
+
+def best_of(fn, repeat):
+    times, out = [], None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        times.append(time.perf_counter() - t0)
+    return min(times), out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark points vs grouped DB loading in preprocess.py.")
+    parser.add_argument("--mongo-url", default=database.MONGO_URL)
+    parser.add_argument("--db", default="bench_preprocess")
+    parser.add_argument("--vessels", type=int, default=2000)
+    parser.add_argument("--snapshots", type=int, default=120)
+    parser.add_argument("--timespan", type=int, default=5, help="Minutes of history per snapshot (overlap).")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--keep", action="store_true", help="Keep (and reuse with --no-seed) the scratch database.")
+    parser.add_argument("--no-seed", action="store_true")
+    parser.add_argument("--workers", type=int, nargs="*", default=[], help="Worker counts for the partitioned read.")
+    parser.add_argument("--mode", default="points", choices=("points", "grouped", "raw"), help="Load mode for --workers.")
+    args = parser.parse_args()
+
+    database.MONGO_URL = args.mongo_url
+    pp.DB_NAME = args.db
+    pp.DB_SKIP_DOCS = 0
+    db = database.get_db(args.db)
+    col = db[pp.COLLECTION_NAME]
+    if not args.no_seed:
+        t0 = time.perf_counter()
+        seed_snapshots(col, args.vessels, args.snapshots, args.timespan)
+        print(f"Seeded {args.snapshots} snapshots in {time.perf_counter() - t0:.1f}s")
+
+    try:
+        t_points, (points_cols, _, n_points) = best_of(pp.load_track_columns_from_db, args.repeat)
+        t_grouped, (grouped_cols, _, n_grouped) = best_of(pp.load_grouped_track_columns_from_db, args.repeat)
+        t_raw, (raw_cols, _, n_raw) = best_of(pp.load_raw_track_columns_from_db, args.repeat)
+        bytes_points = result_bytes(col, pp.build_point_pipeline(col))
+        bytes_grouped = result_bytes(col, pp.build_grouped_pipeline(col))
+
+        same = same_tracks(points_cols, grouped_cols)
+        same_raw = all(np.array_equal(points_cols[name], raw_cols[name]) for name in pp.TRACK_COLUMNS)
+
+        partitioned = []
+        for workers in args.workers:
+            t, (cols, _, n) = best_of(lambda: pp.load_track_columns_partitioned(num_workers=workers, mode=args.mode), args.repeat)
+            partitioned.append((workers, t, n, same_tracks(points_cols, cols)))
+    finally:
+        if not args.keep:
+            database.get_client().drop_database(args.db)
+
+    print("DB load compare")
+    print(f"points loaded: {n_points} (points), {n_grouped} (grouped); identical after sort/dedup: {same}")
+    print(f"points:  {t_points:.2f}s ({n_points / t_points:.0f} points/s), {bytes_points / 1e6:.1f}MB returned")
+    print(f"grouped: {t_grouped:.2f}s ({n_grouped / t_grouped:.0f} points/s), {bytes_grouped / 1e6:.1f}MB returned")
+    print(f"speedup: {t_points / t_grouped:.2f}x")
+    print(f"raw:     {t_raw:.2f}s ({n_raw / t_raw:.0f} points/s, {t_points / t_raw:.2f}x), identical rows: {same_raw}")
+    for workers, t, n, same in partitioned:
+        print(f"partitioned {args.mode} x{workers}: {t:.2f}s ({n / t:.0f} points/s, {t_points / t:.2f}x vs points), identical: {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Compare per-request latency of the execFile path (one `python predict_traj.py`
+process per request, as src/routes/predictTraj.js used to do) against the
+resident predict_server.py.
+
+Uses stub_track_server.py unless --api-base is given, so both paths see the
+same track-fetch cost and the difference is the cold start. Requests rotate
+through --num-mmsis distinct MMSIs (default: one per request) so the server's
+TrackCache / PredictionCache do not turn the run into cache hits.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import requests
+
+# Ensure project root is on sys.path for local imports
+PROJECT_ROOT = Path(__file__).resolve().parents[0]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from stub_track_server import start_stub_server
+
+
+def summarize(name, samples):
+    arr = np.array(samples) * 1000.0
+    print(
+        f"{name}: n={len(arr)}, mean={arr.mean():.1f}ms, "
+        f"p50={np.percentile(arr, 50):.1f}ms, p95={np.percentile(arr, 95):.1f}ms"
+    )
+
+
+def make_mmsis(first, count):
+    # Consecutive MMSIs starting at `first`; the stub serves a track for any of them
+    return [str(int(first) + i) for i in range(count)]
+
+
+def bench_exec(env, mmsis, n):
+    samples = []
+    for i in range(n):
+        t0 = time.perf_counter()
+        subprocess.run(
+            [sys.executable, str(PROJECT_ROOT / "predict_traj.py")],
+            env={**env, "MMSI": mmsis[i % len(mmsis)]},
+            check=True,
+            capture_output=True,
+        )
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def bench_server(env, mmsis, n, port):
+    proc = subprocess.Popen(
+        [sys.executable, str(PROJECT_ROOT / "predict_server.py")],
+        env={**env, "PREDICT_SERVER_PORT": str(port)},
+        stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        for _ in range(300):
+            try:
+                requests.get(f"{url}/health", timeout=1)
+                break
+            except requests.ConnectionError:
+                time.sleep(0.1)
+        session = requests.Session()
+        samples = []
+        for i in range(n):
+            t0 = time.perf_counter()
+            res = session.get(f"{url}/predict", params={"mmsi": mmsis[i % len(mmsis)]}, timeout=30)
+            res.raise_for_status()
+            samples.append(time.perf_counter() - t0)
+        return samples
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mmsi", default="41200006", help="First MMSI of the rotation.")
+    parser.add_argument("--n", type=int, default=20, help="Requests per path.")
+    parser.add_argument("--num-mmsis", type=int, default=None, help="Distinct MMSIs to rotate through (default: --n).")
+    parser.add_argument("--api-base", default=None, help="Real UIUX API; default is a local stub.")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    stub = None
+    api_base = args.api_base
+    if api_base is None:
+        stub, api_base = start_stub_server()
+    env = {**os.environ, "UIUX_API_BASE": api_base}
+    mmsis = make_mmsis(args.mmsi, args.num_mmsis or args.n)
+
+    try:
+        exec_samples = bench_exec(env, mmsis, args.n)
+        server_samples = bench_server(env, mmsis, args.n, args.port)
+    finally:
+        if stub is not None:
+            stub.shutdown()
+
+    print(f"predictTraj latency compare ({len(mmsis)} distinct MMSIs)")
+    summarize("execFile", exec_samples)
+    summarize("server", server_samples)
+    print(f"execFile/server mean ratio: {np.mean(exec_samples) / np.mean(server_samples):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Compare fetching many vessel tracks serially with a bare requests.get per
+call (the old fetch_trajectories_via_api) against the pooled keep-alive
+session with bounded concurrency (fetch_many_trajectories_via_api).
+
+Runs against stub_track_server.py unless --api-base is given; --delay-ms
+adds simulated per-request latency to the stub.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import requests
+
+# Ensure project root is on sys.path for local imports
+PROJECT_ROOT = Path(__file__).resolve().parents[0]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from load_trajectories import fetch_many_trajectories_via_api
+from stub_track_server import start_stub_server
+
+
+def fetch_serial(mmsis, api_base):
+    url = f"{api_base.rstrip('/')}/vesselTrack"
+    for mmsi in mmsis:
+        res = requests.get(url, params={"mmsi": mmsi}, timeout=30)
+        res.raise_for_status()
+        res.json()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vessels", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--delay-ms", type=float, default=20.0, help="Stub latency per request.")
+    parser.add_argument("--api-base", default=None, help="Real UIUX API; default is a local stub.")
+    args = parser.parse_args()
+
+    stub = None
+    api_base = args.api_base
+    if api_base is None:
+        stub, api_base = start_stub_server(delay_s=args.delay_ms / 1000.0)
+    mmsis = [str(41200000 + i) for i in range(args.vessels)]
+
+    try:
+        t0 = time.perf_counter()
+        fetch_serial(mmsis, api_base)
+        t1 = time.perf_counter()
+        results, errors = fetch_many_trajectories_via_api(mmsis, api_base=api_base, max_workers=args.workers)
+        t2 = time.perf_counter()
+    finally:
+        if stub is not None:
+            stub.shutdown()
+
+    print("Track fetch compare")
+    print(f"vessels: {len(mmsis)}, fetched: {len(results)}, errors: {len(errors)}")
+    print(f"serial requests.get: {t1 - t0:.2f}s ({len(mmsis) / (t1 - t0):.1f} vessels/s)")
+    print(f"pooled x{args.workers}: {t2 - t1:.2f}s ({len(mmsis) / (t2 - t1):.1f} vessels/s)")
+    print(f"speedup: {(t1 - t0) / (t2 - t1):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
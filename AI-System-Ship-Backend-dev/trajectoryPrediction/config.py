@@ -3,7 +3,7 @@ import datetime
 import numpy as np
 
 class model_config(object):
-    MODEL_NAME = "bigru"
+    MODEL_NAME = "bigru"  # "bigru" | "gru" (causal, streamable; see models/build.py)
     MODEL_INPUT_SIZE = 5
     MODEL_HIDDEN_SIZE = 128
     MODEL_NUM_LAYERS = 16
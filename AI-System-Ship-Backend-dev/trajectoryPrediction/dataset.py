@@ -1,14 +1,70 @@
 import numpy as np
 import torch
 import torch.nn as nn
-from torch.utils.data import Dataset, DataLoader
+from torch.utils.data import Dataset, DataLoader, BatchSampler, RandomSampler, SequentialSampler
+
+from dataset_store import ColumnArray, is_dataset_dir, load_dataset_dir
+
+def _as_tensor(x):
+    if isinstance(x, torch.Tensor):
+        return x
+    return torch.from_numpy(np.array(x, dtype=np.float32))
 
 class TrajectoryDataset(Dataset):
     def __init__(self, X, y):
-        self.X = X if isinstance(X, torch.Tensor) else torch.tensor(X, dtype=torch.float32)
-        self.y = y if isinstance(y, torch.Tensor) else torch.tensor(y, dtype=torch.float32)
+        # Memory-mapped inputs (dataset_store directories) stay on disk and are read per sample
+        self.X = X if isinstance(X, (torch.Tensor, np.memmap, ColumnArray)) else torch.tensor(X, dtype=torch.float32)
+        self.y = y if isinstance(y, (torch.Tensor, np.memmap, ColumnArray)) else torch.tensor(y, dtype=torch.float32)
     def __len__(self):
         return len(self.X)
     def __getitem__(self, idx):
-        return self.X[idx], self.y[idx]
+        return _as_tensor(self.X[idx]), _as_tensor(self.y[idx])
+    def to(self, device):
+        self.X = _as_tensor(self.X).to(device)
+        self.y = _as_tensor(self.y).to(device)
+        return self
+
+# Windows gathered on the fly from concatenated trajectory points, so each
+# point is stored once instead of SEQ_LEN times (see preprocess DATASET_FORMAT)
+class WindowDataset(Dataset):
+    def __init__(self, points, starts, seq_len):
+        # points: ndarray / memory-mapped ColumnArray, or a tensor after to(device)
+        self.points = points
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.seq_len = int(seq_len)
+        self.offsets = np.arange(self.seq_len)
+    def __len__(self):
+        return len(self.starts)
+    def __getitem__(self, idx):
+        # idx is one index or a whole batch of indices (make_loader)
+        starts = self.starts[idx]
+        rows = np.expand_dims(starts, -1) + self.offsets
+        if isinstance(self.points, torch.Tensor):
+            rows = torch.from_numpy(rows).to(self.points.device)
+            targets = torch.from_numpy(np.asarray(starts + self.seq_len)).to(self.points.device)
+            return self.points[rows], self.points[targets]
+        return _as_tensor(self.points[rows]), _as_tensor(self.points[starts + self.seq_len])
+    def to(self, device):
+        self.points = _as_tensor(self.points).to(device)
+        return self
+
+def load_processed_dataset(path, split):
+    # split: "train" | "test"; accepts data.npz (both layouts written by
+    # marineTraffic/preprocess.py) or a dataset_store directory (memory-mapped)
+    if is_dataset_dir(path):
+        data = load_dataset_dir(path)
+        return _dataset_from_arrays(data, split)
+    with np.load(path) as data:
+        return _dataset_from_arrays(data, split)
+
+def _dataset_from_arrays(data, split):
+    if f"{split}_points" in data:
+        return WindowDataset(data[f"{split}_points"], data[f"{split}_starts"], data["seq_len"])
+    return TrajectoryDataset(data[f"X_{split}"], data[f"y_{split}"])
 
+def make_loader(dataset, batch_size, shuffle=False):
+    if isinstance(dataset, WindowDataset):
+        # Gather a whole batch per __getitem__ call with one fancy index
+        sampler = RandomSampler(dataset) if shuffle else SequentialSampler(dataset)
+        return DataLoader(dataset, batch_size=None, sampler=BatchSampler(sampler, batch_size, drop_last=False))
+    return DataLoader(dataset, batch_size=batch_size, shuffle=shuffle)
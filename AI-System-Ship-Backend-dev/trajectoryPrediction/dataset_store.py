@@ -0,0 +1,124 @@
+"""
+Memory-mapped dataset directory, an alternative to data.npz.
+
+    data/
+      manifest.json             # arrays, columns, dtypes, shapes
+      seq_len.npy               # non-feature arrays: one .npy each
+      train_starts.npy
+      train_points.lat.npy      # feature arrays [..., 5]: one .npy per column
+      train_points.speed.npy
+      ...
+
+Arrays are opened with np.load(mmap_mode="r"), so training starts without
+reading the dataset and pages are loaded as batches touch them. With
+float16, the normalized speed/course/dist columns are stored as float16;
+lat/lon stay float32 (float16 would round lat/90 to ~5 km). Feature arrays
+come back as ColumnArray, which gathers rows and returns float32.
+
+    python dataset_store.py marineTraffic/data.npz marineTraffic/data [--float16]
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Ensure project root is on sys.path for local imports
+PROJECT_ROOT = Path(__file__).resolve().parents[0]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from marineTraffic.preprocess import FEATURE_NAMES
+
+MANIFEST = "manifest.json"
+FORMAT_VERSION = 1
+FLOAT16_FEATURES = ("speed", "course", "dist")
+
+
+class ColumnArray(object):
+    """[..., F] float array stored as F column arrays; indexing gathers and stacks."""
+
+    def __init__(self, columns):
+        self.columns = columns
+        self.shape = tuple(columns[0].shape) + (len(columns),)
+        self.dtype = np.dtype(np.float32)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, idx):
+        return np.stack([c[idx] for c in self.columns], axis=-1).astype(np.float32, copy=False)
+
+    def __array__(self, dtype=None, copy=None):
+        out = self[...]
+        return out if dtype is None else out.astype(dtype, copy=False)
+
+
+def is_dataset_dir(path):
+    return (Path(path) / MANIFEST).is_file()
+
+
+def _is_feature_array(arr):
+    return arr.ndim >= 2 and arr.shape[-1] == len(FEATURE_NAMES) and np.issubdtype(arr.dtype, np.floating)
+
+
+def save_dataset_dir(out_dir, arrays, float16=False):
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    manifest = {"version": FORMAT_VERSION, "float16": bool(float16), "arrays": {}}
+    for name, arr in arrays.items():
+        arr = np.asarray(arr)
+        if not _is_feature_array(arr):
+            np.save(out_dir / f"{name}.npy", arr)
+            manifest["arrays"][name] = {"file": f"{name}.npy", "dtype": str(arr.dtype), "shape": list(arr.shape)}
+            continue
+        columns = []
+        for i, fname in enumerate(FEATURE_NAMES):
+            dtype = np.float16 if float16 and fname in FLOAT16_FEATURES else np.float32
+            col = np.ascontiguousarray(arr[..., i], dtype=dtype)
+            np.save(out_dir / f"{name}.{fname}.npy", col)
+            columns.append({"name": fname, "file": f"{name}.{fname}.npy", "dtype": str(col.dtype)})
+        manifest["arrays"][name] = {"columns": columns, "shape": list(arr.shape)}
+    # Manifest last: a directory without one is never mistaken for a complete dataset
+    with open(out_dir / MANIFEST, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def load_dataset_dir(path, mmap=True):
+    """{name: array}; feature arrays are ColumnArray over memory-mapped columns."""
+    path = Path(path)
+    with open(path / MANIFEST, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported dataset version in {path / MANIFEST}: {manifest.get('version')}")
+    mmap_mode = "r" if mmap else None
+    arrays = {}
+    for name, spec in manifest["arrays"].items():
+        if "columns" in spec:
+            arrays[name] = ColumnArray([np.load(path / c["file"], mmap_mode=mmap_mode) for c in spec["columns"]])
+        else:
+            arrays[name] = np.load(path / spec["file"], mmap_mode=mmap_mode)
+    return arrays
+
+
+def convert_npz(npz_path, out_dir, float16=False):
+    with np.load(npz_path) as data:
+        arrays = {name: data[name] for name in data.files}
+    return save_dataset_dir(out_dir, arrays, float16=float16)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a preprocessed .npz into a memory-mapped dataset directory.")
+    parser.add_argument("npz_path")
+    parser.add_argument("out_dir")
+    parser.add_argument("--float16", action="store_true", help="Store speed/course/dist columns as float16.")
+    args = parser.parse_args()
+    manifest = convert_npz(args.npz_path, args.out_dir, float16=args.float16)
+    size = sum(p.stat().st_size for p in Path(args.out_dir).glob("*.npy"))
+    print(f"Saved {len(manifest['arrays'])} arrays to {args.out_dir} ({size / 1e6:.1f}MB)")
+
+
+if __name__ == "__main__":
+    main()
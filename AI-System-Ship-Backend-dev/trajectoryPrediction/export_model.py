@@ -0,0 +1,79 @@
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+import torch
+
+# Ensure project root is on sys.path for local imports
+PROJECT_ROOT = Path(__file__).resolve().parents[0]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from config import model_config
+from model_backends import exported_path, load_exported
+from predict_traj import MODEL_PATH, forward_batch, load_model
+
+SEQ_LEN = model_config.SEQ_LEN
+CHECK_BATCH_SIZES = (1, 7, 256)
+ATOL = 1e-4
+
+
+def export_torchscript(model, path):
+    example = torch.zeros(1, SEQ_LEN, model_config.MODEL_INPUT_SIZE)
+    traced = torch.jit.trace(model, example)
+    traced = torch.jit.freeze(traced)
+    traced.save(path)
+
+
+def export_onnx(model, path):
+    # Trace with batch 1 and mark the batch axis dynamic (GRU exports are
+    # only batch-agnostic when traced at batch 1).
+    example = torch.zeros(1, SEQ_LEN, model_config.MODEL_INPUT_SIZE)
+    torch.onnx.export(
+        model,
+        (example,),
+        path,
+        input_names=["x"],
+        output_names=["y"],
+        dynamic_axes={"x": {0: "batch"}, "y": {0: "batch"}},
+        dynamo=False,
+    )
+
+
+def check_outputs(model, exported, backend):
+    # Exported outputs must match eager on several batch sizes
+    torch.manual_seed(0)
+    worst = 0.0
+    with torch.no_grad():
+        for batch_size in CHECK_BATCH_SIZES:
+            x = torch.randn(batch_size, SEQ_LEN, model_config.MODEL_INPUT_SIZE)
+            diff = (model(x) - exported(x)).abs().max().item()
+            worst = max(worst, diff)
+        # Also through the serving entry point (device lookup, numpy in/out)
+        for batch_size in CHECK_BATCH_SIZES:
+            seq = np.random.default_rng(batch_size).standard_normal((batch_size, SEQ_LEN, model_config.MODEL_INPUT_SIZE))
+            diff = np.abs(forward_batch(model, seq) - forward_batch(exported, seq)).max()
+            worst = max(worst, float(diff))
+    print(f"{backend}: max |eager - {backend}| = {worst:.2e} over batch sizes {CHECK_BATCH_SIZES} (model(x) and forward_batch)")
+    if worst > ATOL:
+        raise RuntimeError(f"{backend} export does not match eager model (max diff {worst:.2e} > {ATOL})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a BiGRU checkpoint to TorchScript and ONNX.")
+    parser.add_argument("--model-path", default=MODEL_PATH)
+    parser.add_argument("--formats", nargs="+", default=["torchscript", "onnx"], choices=["torchscript", "onnx"])
+    args = parser.parse_args()
+
+    model = load_model(device=torch.device("cpu"), model_path=args.model_path, backend="eager")
+    exporters = {"torchscript": export_torchscript, "onnx": export_onnx}
+    for backend in args.formats:
+        path = exported_path(args.model_path, backend)
+        exporters[backend](model, path)
+        check_outputs(model, load_exported(path, backend, device=torch.device("cpu")), backend)
+        print(f"Saved {backend}: {path}")
+
+
+if __name__ == "__main__":
+    main()
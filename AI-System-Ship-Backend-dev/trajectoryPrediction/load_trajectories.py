@@ -1,7 +1,13 @@
 import os
 import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # Ensure project root is on sys.path for local imports
 PROJECT_ROOT = Path(__file__).resolve().parents[0]
@@ -14,6 +20,16 @@ from database import get_db
 DB_NAME = "ais_data_test"
 COLLECTION_NAME = "vesselPosition"
 
+# UIUX API client settings
+HTTP_POOL_SIZE = 32  # Keep-alive connections; should be >= FETCH_MAX_WORKERS
+FETCH_MAX_WORKERS = 16
+HTTP_RETRIES = 3
+HTTP_BACKOFF_S = 0.5  # Sleeps 0.5, 1, 2 s between retries
+HTTP_RETRY_STATUS = (429, 500, 502, 503, 504)
+
+_session = None
+_session_lock = threading.Lock()
+
 def load_trajectories(limit=1):
     db = get_db(DB_NAME)
     col = db[COLLECTION_NAME]
@@ -22,14 +38,36 @@ def load_trajectories(limit=1):
         return []
     return doc.get("data", [])
 
+def get_session():
+    # Shared keep-alive session; retries connection errors and 429/5xx with backoff
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = Retry(
+                total=HTTP_RETRIES,
+                backoff_factor=HTTP_BACKOFF_S,
+                status_forcelist=HTTP_RETRY_STATUS,
+                allowed_methods=("GET",),
+                raise_on_status=False,
+            )
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE, max_retries=retry)
+            session = requests.Session()
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
 # Fetch trajectories via UIUX API 
-def fetch_trajectories_via_api(mmsi, api_base=None, timeout=30):
-    api_base = api_base or "http://140.115.53.51:3000/api/v1"
+# `since` (ISO timestamp) asks only for points newer than that time
+def fetch_trajectories_via_api(mmsi, api_base=None, timeout=30, since=None):
+    api_base = api_base or os.getenv("UIUX_API_BASE", "http://140.115.53.51:3000/api/v1")
     if not api_base:
         raise RuntimeError("Missing UIUX_API_BASE or API_BASE environment variable")
     url = f"{api_base.rstrip('/')}/vesselTrack"
     params = {"mmsi": mmsi}
-    res = requests.get(url, params=params, timeout=timeout)
+    if since is not None:
+        params["since"] = since
+    res = get_session().get(url, params=params, timeout=timeout)
     res.raise_for_status()
     data = res.json()
     # Basic checks
@@ -39,6 +77,97 @@ def fetch_trajectories_via_api(mmsi, api_base=None, timeout=30):
         return []
     return data
 
+def run_concurrently(fn, mmsis, max_workers=FETCH_MAX_WORKERS):
+    """Call fn(mmsi) for every MMSI on a bounded thread pool.
+
+    Returns (results, errors): {mmsi: fn(mmsi)} and {mmsi: message}.
+    """
+    results = {}
+    errors = {}
+    if not mmsis:
+        return results, errors
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(mmsis))) as pool:
+        futures = {mmsi: pool.submit(fn, mmsi) for mmsi in mmsis}
+        for mmsi, fut in futures.items():
+            try:
+                results[mmsi] = fut.result()
+            except Exception as e:
+                errors[mmsi] = str(e)
+    return results, errors
+
+def fetch_many_trajectories_via_api(mmsis, api_base=None, timeout=30, max_workers=FETCH_MAX_WORKERS):
+    # Bulk /vesselTrack fetch over the pooled session
+    return run_concurrently(
+        lambda mmsi: fetch_trajectories_via_api(mmsi, api_base=api_base, timeout=timeout),
+        mmsis,
+        max_workers=max_workers,
+    )
+
+class TrackCache(object):
+    """Per-MMSI cache with LRU eviction and a TTL.
+
+    Holds parsed track arrays so repeated predictions for the same vessel
+    skip both the /vesselTrack request and point extraction. The TTL should
+    follow the AIS update cadence (vesselPosition.py polls every 60 s).
+    """
+
+    def __init__(self, max_size=4096, ttl_s=60.0):
+        self.max_size = max_size
+        self.ttl_s = ttl_s
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def get(self, mmsi):
+        key = str(mmsi)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            stored_at, value = entry
+            if time.monotonic() - stored_at > self.ttl_s:
+                del self._entries[key]
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, mmsi, value):
+        key = str(mmsi)
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, mmsi=None):
+        with self._lock:
+            if mmsi is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(str(mmsi), None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_s": self.ttl_s,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "expired": self.expired,
+                "evictions": self.evictions,
+            }
+
 if __name__ == "__main__":
     # Quick fetch check
     sample_mmsi = os.getenv("MMSI", "41200006")
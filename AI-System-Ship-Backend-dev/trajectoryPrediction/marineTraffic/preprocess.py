@@ -2,11 +2,15 @@ import json
 import os
 import sys
 import time
+import zipfile
+import zlib
 from collections import Counter
-from multiprocessing import cpu_count
+from multiprocessing import get_context
 from pathlib import Path
+import bson
 import numpy as np
-from sklearn.model_selection import train_test_split
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
 from tqdm import tqdm
 
 # Ensure project root is on sys.path for local imports
@@ -14,20 +18,46 @@ PROJECT_ROOT = Path(__file__).resolve().parents[1]
 if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
 
-from database import get_db
+from database import get_client, get_db
+from utils.windowing import TrajectoryWindows
 
 # USER SETTINGS
 DB_NAME = "ais_data_test"
 COLLECTION_NAME = "vesselPosition"
 UPDATE_DATA = True
 LOAD_RECORDS_MULTIPROCESS = False
-NUM_WORKERS = max(1, cpu_count() - 1)
-MP_CHUNK_SIZE = 64
 DB_SKIP_DOCS = 8
 DB_CURSOR_BATCH_SIZE = 1024
+# "points": one cursor row per AIS point, cast in Python
+# "grouped": cast, sorted and $group-ed by MMSI in MongoDB, one document of
+#            numeric arrays per vessel and GROUP_BUCKET_MS (see build_grouped_pipeline)
+# "raw":     snapshots as RawBSONDocument, only the needed point fields pulled
+#            from the raw bytes (see load_raw_track_columns_from_db)
+DB_LOAD_MODE = "points"
+GROUP_BUCKET_MS = 86400 * 1000  # Keeps each vessel document far below the 16MB BSON limit
+# >1: read _id-range partitions of the collection in parallel (load_track_columns_partitioned)
+DB_READ_WORKERS = 1
+DB_PARTITIONS_PER_WORKER = 4  # Smaller ranges balance uneven snapshot sizes
 SEQ_LEN = 10
 TRAIN_RATIO = 0.8
 SHIPTYPE_FILTER = "70"  # Set to None to include all ship types
+# Snapshots are polled every 60 s with a 5 min timespan, so the same
+# (MMSI, TIMESTAMP) point arrives in up to ~5 snapshots; keep the first
+DEDUP_POINTS = True
+# Split a vessel's track where consecutive points are more than this many
+# seconds apart (None: one trajectory per vessel, see segment_track_columns).
+# Changes the dataset (untimed points and short fragments are dropped), so
+# retrain and re-save norm_stats.json after enabling it, e.g. 30 * 60
+SEGMENT_GAP_S = None
+# Resample each segment to one point every RESAMPLE_INTERVAL_S seconds
+# (None: keep the reported points). Inference feeds raw points, so enable
+# together with resampling on the serving side.
+RESAMPLE_INTERVAL_S = None
+RESAMPLE_METHOD = "great_circle"  # "great_circle" | "linear" (lat/lon in degrees)
+MIN_SEGMENT_POINTS = SEQ_LEN + 1  # Shorter fragments yield no window and are dropped
+# "lazy": per-trajectory points + window starts (each point stored once, see dataset.WindowDataset)
+# "windows": dense X/y windows [N, SEQ_LEN, 5] (each point stored ~SEQ_LEN times)
+DATASET_FORMAT = "lazy"
 
 BASE_DIR = Path(__file__).resolve().parent
 OUTPUT_NPZ = str(BASE_DIR / "data.npz")
@@ -36,6 +66,9 @@ NORM_STATS_JSON = str(BASE_DIR / "norm_stats.json")
 NORM_FEATURE_IDX = (2, 3, 4)
 FEATURE_NAMES = ["lat", "lon", "speed", "course", "dist"]
 FEATURE_INDEX = {name: i for i, name in enumerate(FEATURE_NAMES)}
+# Columnar track table: one array per field, one row per AIS point
+TRACK_COLUMNS = ("mmsi", "t", "lat", "lon", "speed", "course")
+MISSING_TIME = np.iinfo(np.int64).min  # Sorts first, like the "" key for a missing TIMESTAMP
 
 def _to_float(v):
     try:
@@ -117,11 +150,12 @@ def append_step_distance_feature(x, lat_idx=0, lon_idx=1):
 def recover_next_lat_lon(pred, latest_point=None, lat_idx=0, lon_idx=1):
     out = pred.copy()
     # lat_lon_rate_transform currently stores absolute scaled lat/lon in [-1, 1].
-    pred_lat_scaled = np.clip(float(out[lat_idx]), -1.0, 1.0)
-    pred_lon_scaled = np.clip(float(out[lon_idx]), -1.0, 1.0)
+    # Works on a single point [5] or a batch [..., 5].
+    pred_lat_scaled = np.clip(out[..., lat_idx], -1.0, 1.0)
+    pred_lon_scaled = np.clip(out[..., lon_idx], -1.0, 1.0)
 
-    out[lat_idx] = pred_lat_scaled * 90.0
-    out[lon_idx] = pred_lon_scaled * 180.0
+    out[..., lat_idx] = pred_lat_scaled * 90.0
+    out[..., lon_idx] = pred_lon_scaled * 180.0
     return out
 
 def load_records_from_db():
@@ -146,22 +180,35 @@ def load_records_from_db():
         if shiptype_filter is None:
             extend_records(data)
         else:
-            extend_records(
-                d for d in data
-                if str(d.get("SHIPTYPE")) == shiptype_filter
-            )
+            extend_records(d for d in data if shiptype_matches(d, shiptype_filter))
     return records
 
-def load_trajectory_map_from_db():
-    """Stream DB data via aggregation and build trajectory map directly."""
-    db = get_db(DB_NAME)
-    col = db[COLLECTION_NAME]
+def shiptype_matches(point, shiptype_filter):
+    # Client-side twin of the {"data.SHIPTYPE": filter} match every loader uses:
+    # the exact SHIPTYPE value, no "shiptype" fallback
+    return shiptype_filter is None or point.get("SHIPTYPE") == shiptype_filter
 
+def build_point_pipeline(col, after_id=None, id_range=None):
+    """Aggregation that flattens snapshots into one row per AIS point.
+
+    Snapshots are read in _id (insertion) order. With `after_id`, only
+    snapshots inserted after it are read; with `id_range` (lo, hi), only
+    lo <= _id < hi (hi None: no upper bound); otherwise the first
+    DB_SKIP_DOCS (test) snapshots are skipped. Each row carries its
+    snapshot's DOC_ID.
+    """
     shiptype_filter = None if SHIPTYPE_FILTER is None else str(SHIPTYPE_FILTER)
 
-    pipeline = [
-        {"$skip": DB_SKIP_DOCS},
-        {"$project": {"_id": 0, "data": 1}},
+    pipeline = [{"$sort": {"_id": 1}}]
+    if id_range is not None:
+        lo, hi = id_range
+        pipeline.append({"$match": {"_id": {"$gte": lo} if hi is None else {"$gte": lo, "$lt": hi}}})
+    elif after_id is None:
+        pipeline.append({"$skip": DB_SKIP_DOCS})
+    else:
+        pipeline.append({"$match": {"_id": {"$gt": after_id}}})
+    pipeline += [
+        {"$project": {"_id": 1, "data": 1}},
         {"$unwind": "$data"},
     ]
     if shiptype_filter is not None:
@@ -175,6 +222,7 @@ def load_trajectory_map_from_db():
         {
             "$project": {
                 "_id": 0,
+                "DOC_ID": "$_id",
                 "MMSI": "$data.MMSI",
                 "LAT": "$data.LAT",
                 "LON": "$data.LON",
@@ -185,13 +233,70 @@ def load_trajectory_map_from_db():
             }
         }
     )
+    return pipeline
 
-    traj_map = {}
-    ship_type_counts = Counter()
-    valid_point_count = 0
+def parse_timestamps(timestamps):
+    """ISO strings ("2026-02-06T08:53:11") -> int64 epoch seconds in one call.
+
+    Missing values become MISSING_TIME. Falls back to per-value parsing only
+    if numpy rejects the batch (e.g. a malformed string).
+    """
+    values = [None if not ts else str(ts) for ts in timestamps]
+    try:
+        parsed = np.array(values, dtype="datetime64[s]")
+    except ValueError:
+        parsed = np.array([_parse_timestamp_or_nat(ts) for ts in values], dtype="datetime64[s]")
+    out = parsed.astype(np.int64)
+    out[np.isnat(parsed)] = MISSING_TIME
+    return out
+
+def _parse_timestamp_or_nat(ts):
+    try:
+        return np.datetime64(ts, "s")
+    except (TypeError, ValueError):
+        return np.datetime64("NaT")
+
+def _columns_from_rows(rows):
+    mmsi, ts, lat, lon, speed, course = zip(*rows)
+    return {
+        "mmsi": np.array(mmsi, dtype=str),
+        "t": parse_timestamps(ts),
+        "lat": np.array(lat, dtype=np.float64),
+        "lon": np.array(lon, dtype=np.float64),
+        "speed": np.array(speed, dtype=np.float64),
+        "course": np.array(course, dtype=np.float64),
+    }
+
+def concat_track_columns(chunks):
+    if not chunks:
+        return {
+            "mmsi": np.zeros(0, dtype=str),
+            "t": np.zeros(0, dtype=np.int64),
+            **{name: np.zeros(0, dtype=np.float64) for name in TRACK_COLUMNS[2:]},
+        }
+    return {name: np.concatenate([c[name] for c in chunks]) for name in TRACK_COLUMNS}
+
+def load_track_columns_from_db():
+    """Stream DB points into a columnar table ({TRACK_COLUMNS: array}).
+
+    Rows are converted (timestamps to int64 epoch seconds) every
+    DB_CURSOR_BATCH_SIZE rows while the cursor streams.
+    """
+    db = get_db(DB_NAME)
+    col = db[COLLECTION_NAME]
+    pipeline = build_point_pipeline(col)
 
     cursor = col.aggregate(pipeline, allowDiskUse=True, batchSize=DB_CURSOR_BATCH_SIZE)
-    for r in tqdm(cursor, desc=f"Loading+building trajectories agg (batch={DB_CURSOR_BATCH_SIZE})"):
+    columns, ship_type_counts = _point_columns_from_cursor(
+        tqdm(cursor, desc=f"Loading track columns agg (batch={DB_CURSOR_BATCH_SIZE})")
+    )
+    return columns, ship_type_counts, columns["t"].shape[0]
+
+def _point_columns_from_cursor(cursor):
+    chunks = []
+    rows = []
+    ship_type_counts = Counter()
+    for r in cursor:
         ship_type = r.get("SHIPTYPE")
         ship_key = str(ship_type) if ship_type is not None else "UNKNOWN"
         ship_type_counts[ship_key] += 1
@@ -201,13 +306,439 @@ def load_trajectory_map_from_db():
         lon = _to_float(r.get("LON"))
         speed = _to_float(r.get("SPEED"))
         course = _to_float(r.get("COURSE"))
-        ts = r.get("TIMESTAMP")
         if mmsi is None or lat is None or lon is None or speed is None or course is None:
             continue
-        traj_map.setdefault(mmsi, []).append((ts, lat, lon, speed, course))
-        valid_point_count += 1
+        rows.append((mmsi, r.get("TIMESTAMP"), lat, lon, speed, course))
+        if len(rows) >= DB_CURSOR_BATCH_SIZE:
+            chunks.append(_columns_from_rows(rows))
+            rows = []
+    if rows:
+        chunks.append(_columns_from_rows(rows))
+    return concat_track_columns(chunks), ship_type_counts
+
+def duplicate_point_mask(mmsi, t, missing=MISSING_TIME):
+    """True for rows repeating the previous row's (MMSI, time) in (MMSI, time)-sorted input.
+
+    The first row of each run is kept; rows without a timestamp are never
+    treated as duplicates.
+    """
+    dup = np.zeros(t.shape[0], dtype=bool)
+    if t.shape[0] > 1:
+        dup[1:] = (t[1:] == t[:-1]) & (mmsi[1:] == mmsi[:-1]) & (t[1:] != missing)
+    return dup
+
+def _to_double_expr(field):
+    # Server-side _to_float: unparsable or missing -> null
+    return {"$convert": {"input": field, "to": "double", "onError": None, "onNull": None}}
+
+def build_grouped_pipeline(col, id_range=None):
+    """build_point_pipeline plus casting, sorting and grouping in MongoDB.
+
+    Returns one document per (MMSI, GROUP_BUCKET_MS bucket):
+    {_id: {mmsi, bucket}, SHIPTYPE, t: [epoch ms], lat: [...], lon: [...],
+    speed: [...], course: [...]}, arrays ordered by (time, snapshot _id).
+    Points with a non-numeric LAT/LON/SPEED/COURSE are dropped; a missing
+    or unparsable TIMESTAMP becomes MISSING_TIME.
+    """
+    pipeline = build_point_pipeline(col, id_range=id_range)
+    pipeline += [
+        {
+            "$project": {
+                "DOC_ID": 1,
+                "SHIPTYPE": 1,
+                "MMSI": {"$toString": "$MMSI"},
+                "t": {
+                    "$ifNull": [
+                        {"$toLong": {"$convert": {"input": "$TIMESTAMP", "to": "date", "onError": None, "onNull": None}}},
+                        int(MISSING_TIME),
+                    ]
+                },
+                "lat": _to_double_expr("$LAT"),
+                "lon": _to_double_expr("$LON"),
+                "speed": _to_double_expr("$SPEED"),
+                "course": _to_double_expr("$COURSE"),
+            }
+        },
+        {"$match": {name: {"$ne": None} for name in ("MMSI", "lat", "lon", "speed", "course")}},
+        {"$sort": {"MMSI": 1, "t": 1, "DOC_ID": 1}},
+        {
+            "$group": {
+                "_id": {"mmsi": "$MMSI", "bucket": {"$floor": {"$divide": ["$t", GROUP_BUCKET_MS]}}},
+                "SHIPTYPE": {"$first": "$SHIPTYPE"},
+                **{name: {"$push": f"${name}"} for name in TRACK_COLUMNS[1:]},
+            }
+        },
+        {"$sort": {"_id.mmsi": 1, "_id.bucket": 1}},
+    ]
+    return pipeline
+
+def load_grouped_track_columns_from_db():
+    """load_track_columns_from_db() with build_grouped_pipeline: one NumPy
+    conversion per vessel document instead of per-point dicts and casts."""
+    db = get_db(DB_NAME)
+    col = db[COLLECTION_NAME]
+    pipeline = build_grouped_pipeline(col)
+
+    cursor = col.aggregate(pipeline, allowDiskUse=True, batchSize=DB_CURSOR_BATCH_SIZE)
+    columns, ship_type_counts = _grouped_columns_from_cursor(
+        tqdm(cursor, desc=f"Loading grouped tracks agg (batch={DB_CURSOR_BATCH_SIZE})")
+    )
+    return columns, ship_type_counts, columns["t"].shape[0]
+
+def _grouped_columns_from_cursor(cursor):
+    chunks = []
+    ship_type_counts = Counter()
+    for g in cursor:
+        t = np.array(g["t"], dtype=np.int64)
+        missing = t == MISSING_TIME
+        t //= 1000
+        t[missing] = MISSING_TIME
+        ship_type = g.get("SHIPTYPE")
+        ship_type_counts[str(ship_type) if ship_type is not None else "UNKNOWN"] += t.shape[0]
+        chunk = {"mmsi": np.full(t.shape[0], g["_id"]["mmsi"]), "t": t}
+        for name in TRACK_COLUMNS[2:]:
+            chunk[name] = np.array(g[name], dtype=np.float64)
+        chunks.append(chunk)
+    return concat_track_columns(chunks), ship_type_counts
+
+# Point fields read by the "raw" load mode
+RAW_POINT_FIELDS = ("MMSI", "TIMESTAMP", "LAT", "LON", "SPEED", "COURSE", "SHIPTYPE", "shiptype")
+
+def _raw_snapshot_fields(raw):
+    """{field: [value per point]} for one raw (projected) snapshot document.
+
+    Snapshots are decoded one at a time, so only one snapshot's point dicts
+    are alive at once (a decoded cursor batch holds DB_CURSOR_BATCH_SIZE
+    snapshots); the projection already dropped the unused fields.
+    """
+    data = bson.decode(raw).get("data") or []
+    return {name: [p.get(name) for p in data] for name in RAW_POINT_FIELDS}
+
+def _float_column(values):
+    # One C-level cast; unparsable values (e.g. "") fall back to _to_float. Invalid/missing -> NaN
+    try:
+        return np.array(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        parsed = (_to_float(v) for v in values)
+        return np.array([np.nan if v is None else v for v in parsed], dtype=np.float64)
+
+def _columns_from_raw_fields(chunks, shiptype_filter=None):
+    # Same filter, counts and validity rules as build_point_pipeline + _point_columns_from_cursor
+    fields = {name: [v for c in chunks for v in c[name]] for name in RAW_POINT_FIELDS}
+    ship_type = np.array(fields["SHIPTYPE"], dtype=object)
+    ship_type_lower = np.array(fields["shiptype"], dtype=object)
+    if shiptype_filter is None:
+        keep = np.ones(ship_type.shape[0], dtype=bool)
+    else:
+        keep = ship_type == shiptype_filter
+    ship_key = np.where(
+        np.not_equal(ship_type, None), ship_type,
+        np.where(np.not_equal(ship_type_lower, None), ship_type_lower, "UNKNOWN"),
+    )
+    counts = Counter(map(str, ship_key[keep]))
+
+    columns = {}
+    for name, field in zip(TRACK_COLUMNS[2:], ("LAT", "LON", "SPEED", "COURSE")):
+        columns[name] = _float_column(fields[field])
+        keep &= ~np.isnan(columns[name])
+    mmsi = np.array(fields["MMSI"], dtype=object)
+    keep &= np.not_equal(mmsi, None)
+    columns = {name: arr[keep] for name, arr in columns.items()}
+    columns["mmsi"] = mmsi[keep].astype(str)
+    columns["t"] = parse_timestamps(np.array(fields["TIMESTAMP"], dtype=object)[keep])
+    return columns, counts
+
+def first_unskipped_id(col, skip=None):
+    """_id of the first snapshot after the first `skip` (DB_SKIP_DOCS) in _id
+    order, or None if there is none.
+
+    Counts all snapshots, like build_point_pipeline's $skip before the
+    SHIPTYPE $match, not only those matching SHIPTYPE_FILTER.
+    """
+    skip = DB_SKIP_DOCS if skip is None else skip
+    doc = next(col.find({}, {"_id": 1}).sort("_id", 1).skip(skip).limit(1), None)
+    return None if doc is None else doc["_id"]
+
+def snapshot_query(id_range):
+    """find() filter for snapshots lo <= _id < hi (hi None: no upper bound)
+    containing a SHIPTYPE_FILTER point; id_range None matches nothing."""
+    if id_range is None:
+        query = {"_id": {"$in": []}}
+    else:
+        lo, hi = id_range
+        query = {"_id": {"$gte": lo} if hi is None else {"$gte": lo, "$lt": hi}}
+    if SHIPTYPE_FILTER is not None:
+        query["data.SHIPTYPE"] = str(SHIPTYPE_FILTER)
+    return query
+
+def _raw_snapshot_cursor(col, id_range=None):
+    # find() over whole snapshots, decoded lazily, with only RAW_POINT_FIELDS projected;
+    # without id_range, the snapshots build_point_pipeline reads (first DB_SKIP_DOCS skipped)
+    raw_col = col.with_options(codec_options=CodecOptions(document_class=RawBSONDocument))
+    projection = {"_id": 0, **{f"data.{name}": 1 for name in RAW_POINT_FIELDS}}
+    if id_range is None:
+        lo = first_unskipped_id(col)
+        id_range = None if lo is None else (lo, None)
+    cursor = raw_col.find(snapshot_query(id_range), projection).sort("_id", 1)
+    return cursor.batch_size(DB_CURSOR_BATCH_SIZE)
+
+def _raw_columns_from_cursor(cursor):
+    shiptype_filter = None if SHIPTYPE_FILTER is None else str(SHIPTYPE_FILTER)
+    chunks = []
+    pending, n_pending = [], 0
+    ship_type_counts = Counter()
+    for doc in cursor:
+        fields = _raw_snapshot_fields(doc.raw)
+        pending.append(fields)
+        n_pending += len(fields["MMSI"])
+        if n_pending >= DB_CURSOR_BATCH_SIZE:
+            columns, counts = _columns_from_raw_fields(pending, shiptype_filter)
+            chunks.append(columns)
+            ship_type_counts.update(counts)
+            pending, n_pending = [], 0
+    if pending:
+        columns, counts = _columns_from_raw_fields(pending, shiptype_filter)
+        chunks.append(columns)
+        ship_type_counts.update(counts)
+    return concat_track_columns(chunks), ship_type_counts
+
+def load_raw_track_columns_from_db():
+    """load_track_columns_from_db() without per-point dicts.
+
+    Snapshots are read with a RawBSONDocument codec and a projection of
+    RAW_POINT_FIELDS, so cursor batches stay as BSON bytes; each snapshot
+    is decoded on its own (_raw_snapshot_fields) and its fields are cast
+    to typed arrays per DB_CURSOR_BATCH_SIZE points, with one NumPy call
+    per column. Same columns, in the same order, as the points mode.
+    """
+    col = get_db(DB_NAME)[COLLECTION_NAME]
+    cursor = _raw_snapshot_cursor(col)
+    columns, ship_type_counts = _raw_columns_from_cursor(tqdm(cursor, desc="Loading raw snapshots"))
+    return columns, ship_type_counts, columns["t"].shape[0]
+
+def partition_id_ranges(col, n_parts):
+    """Split the snapshots after the first DB_SKIP_DOCS into about
+    equal-count _id ranges [(lo, hi)]; the last range is open-ended, so
+    snapshots inserted meanwhile are still read."""
+    total = max(0, col.count_documents({}) - DB_SKIP_DOCS)
+    if total == 0:
+        return []
+    n_parts = max(1, min(n_parts, total))
+    bounds = []
+    for k in range(n_parts):
+        cursor = col.find({}, {"_id": 1}).sort("_id", 1).skip(DB_SKIP_DOCS + k * total // n_parts).limit(1)
+        bounds.append(next(cursor)["_id"])
+    return list(zip(bounds, bounds[1:] + [None]))
+
+_READ_CLIENT = None
+
+def _init_read_worker():
+    # One MongoClient per worker process, reused for all of its ranges
+    global _READ_CLIENT
+    _READ_CLIENT = get_client()
+
+def _load_partition(args):
+    mode, id_range = args
+    col = _READ_CLIENT[DB_NAME][COLLECTION_NAME]
+    if mode == "grouped":
+        cursor = col.aggregate(build_grouped_pipeline(col, id_range=id_range), allowDiskUse=True, batchSize=DB_CURSOR_BATCH_SIZE)
+        return _grouped_columns_from_cursor(cursor)
+    if mode == "raw":
+        return _raw_columns_from_cursor(_raw_snapshot_cursor(col, id_range=id_range))
+    cursor = col.aggregate(build_point_pipeline(col, id_range=id_range), allowDiskUse=True, batchSize=DB_CURSOR_BATCH_SIZE)
+    return _point_columns_from_cursor(cursor)
+
+def load_track_columns_partitioned(num_workers=None, mode=None):
+    """load_track_columns_from_db() (or the grouped mode) over a process pool.
+
+    The collection is split into num_workers * DB_PARTITIONS_PER_WORKER
+    _id ranges (partition_id_ranges), each read by one aggregation. Ranges
+    are concatenated in _id order, so the columns match a single-cursor
+    read row for row.
+    """
+    num_workers = DB_READ_WORKERS if num_workers is None else num_workers
+    mode = DB_LOAD_MODE if mode is None else mode
+    col = get_db(DB_NAME)[COLLECTION_NAME]
+    ranges = partition_id_ranges(col, num_workers * DB_PARTITIONS_PER_WORKER)
+
+    ctx = get_context("fork") if sys.platform.startswith("linux") else get_context()
+    with ctx.Pool(max(1, min(num_workers, len(ranges))), initializer=_init_read_worker) as pool:
+        results = list(tqdm(
+            pool.imap(_load_partition, [(mode, id_range) for id_range in ranges]),
+            total=len(ranges),
+            desc=f"Loading track columns ({mode}, {num_workers} workers)",
+        ))
+    columns = concat_track_columns([c for c, _ in results])
+    ship_type_counts = Counter()
+    for _, counts in results:
+        ship_type_counts.update(counts)
+    return columns, ship_type_counts, columns["t"].shape[0]
 
-    return traj_map, ship_type_counts, valid_point_count
+def sort_track_columns(columns, dedup=DEDUP_POINTS):
+    """Order all points by (MMSI, time) with one lexsort.
+
+    Returns (sorted columns, mmsis, offsets): vessel i is rows
+    offsets[i]:offsets[i + 1]. Points with equal time keep load order;
+    with `dedup`, only the first of them is kept.
+    """
+    order = np.lexsort((columns["t"], columns["mmsi"]))
+    if dedup:
+        sorted_mmsi, sorted_t = columns["mmsi"][order], columns["t"][order]
+        order = order[~duplicate_point_mask(sorted_mmsi, sorted_t)]
+    columns = {name: arr[order] for name, arr in columns.items()}
+    mmsis, starts = np.unique(columns["mmsi"], return_index=True)
+    offsets = np.append(starts, columns["mmsi"].shape[0]).astype(np.int64)
+    return columns, mmsis, offsets
+
+def build_features_columnar(columns, offsets):
+    """Per-MMSI [T, 5] feature arrays from sorted columns, without a per-vessel loop.
+
+    Distances are computed across the whole table and reset to 0 at each
+    vessel's first point; the results are views into one array.
+    """
+    arr = np.stack([columns[name] for name in ("lat", "lon", "speed", "course")], axis=1).astype(np.float32)
+    arr = append_step_distance_feature(arr)
+    arr[offsets[:-1][offsets[:-1] < arr.shape[0]], FEATURE_INDEX["dist"]] = 0.0
+    arr = lat_lon_rate_transform(arr)
+    return [arr[start:end] for start, end in zip(offsets[:-1], offsets[1:])]
+
+def drop_short_segments(columns, offsets, seg_vessel, min_points):
+    """Keep only segments with at least min_points rows; returns (columns, offsets, seg_vessel)."""
+    lengths = np.diff(offsets)
+    keep = lengths >= min_points
+    if keep.all():
+        return columns, offsets, seg_vessel
+    rows = np.repeat(keep, lengths)
+    columns = {name: arr[rows] for name, arr in columns.items()}
+    offsets = np.concatenate([[0], np.cumsum(lengths[keep])]).astype(np.int64)
+    return columns, offsets, seg_vessel[keep]
+
+def segment_track_columns(columns, offsets, gap_s=SEGMENT_GAP_S, min_points=MIN_SEGMENT_POINTS):
+    """Split sorted per-vessel tracks wherever the time step exceeds gap_s.
+
+    Points without a timestamp cannot be placed and are dropped. Returns
+    (columns, seg_offsets, seg_vessel): segment i is rows
+    seg_offsets[i]:seg_offsets[i + 1] of vessel seg_vessel[i] (an index into
+    offsets); segments shorter than min_points are dropped.
+    """
+    vessel = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    timed = columns["t"] != MISSING_TIME
+    if not timed.all():
+        columns = {name: arr[timed] for name, arr in columns.items()}
+        vessel = vessel[timed]
+    t = columns["t"]
+    starts = np.ones(t.shape[0], dtype=bool)
+    starts[1:] = vessel[1:] != vessel[:-1]
+    if gap_s is not None:
+        starts[1:] |= np.diff(t) > gap_s
+    first = np.flatnonzero(starts)
+    seg_offsets = np.append(first, t.shape[0]).astype(np.int64)
+    return drop_short_segments(columns, seg_offsets, vessel[first], min_points)
+
+def _step_deltas(x, period=None):
+    # x[i + 1] - x[i] per row (0 on the last); with a period, along the shorter arc
+    d = np.zeros(x.shape[0], dtype=np.float64)
+    d[:-1] = x[1:] - x[:-1]
+    if period is not None:
+        d[:-1] = (d[:-1] + period / 2) % period - period / 2
+    return d
+
+def _wrap_degrees(x, low, period=360.0):
+    # Values at most one period out of [low, low + period)
+    x[x < low] += period
+    x[x >= low + period] -= period
+    return x
+
+def _slerp_lat_lon(lat, lon, left, w):
+    # Great-circle interpolation between points left and left + 1 on unit vectors;
+    # nearly coincident points fall back to a lerp
+    phi, lam = np.deg2rad(lat), np.deg2rad(lon)
+    p = np.stack([np.cos(phi) * np.cos(lam), np.cos(phi) * np.sin(lam), np.sin(phi)], axis=1)
+    omega = np.zeros(p.shape[0])
+    omega[:-1] = np.arccos(np.clip(np.einsum("ij,ij->i", p[:-1], p[1:]), -1.0, 1.0))
+    omega = omega[left]
+    sin_omega = np.sin(omega)
+    tiny = sin_omega < 1e-12
+    safe = np.where(tiny, 1.0, sin_omega)
+    a = np.where(tiny, 1.0 - w, np.sin((1.0 - w) * omega) / safe)
+    b = np.where(tiny, w, np.sin(w * omega) / safe)
+    q = a[:, None] * p[left] + b[:, None] * p[np.minimum(left + 1, p.shape[0] - 1)]
+    return np.rad2deg(np.arctan2(q[:, 2], np.hypot(q[:, 0], q[:, 1]))), np.rad2deg(np.arctan2(q[:, 1], q[:, 0]))
+
+def resample_track_columns(columns, seg_offsets, interval_s=RESAMPLE_INTERVAL_S, method=RESAMPLE_METHOD):
+    """Resample every segment to one point per interval_s, all segments at once.
+
+    Segment i gets times t0, t0 + interval_s, ... up to its last point; each
+    value is interpolated between the bracketing reported points (found with
+    one bincount over all segments). Speed is linear, course follows the
+    shorter arc, lat/lon follow `method`. Returns (columns, offsets) with
+    the same segments in the same order.
+    """
+    if method not in ("great_circle", "linear"):
+        raise ValueError(f"Unknown RESAMPLE_METHOD: {method}")
+    t = columns["t"]
+    lengths = np.diff(seg_offsets)
+    t0 = t[seg_offsets[:-1]]
+    t1 = t[seg_offsets[1:] - 1]
+    counts = (t1 - t0) // interval_s + 1
+    offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+    grid_t = np.repeat(t0 - offsets[:-1] * interval_s, counts) + np.arange(offsets[-1]) * interval_s
+
+    # Grid slot of the first sample at or after each reported point (non-decreasing
+    # over the table); counting points per slot gives each sample's left point
+    slot = np.repeat(offsets[:-1], lengths) - (np.repeat(t0, lengths) - t) // interval_s
+    left = np.cumsum(np.bincount(slot, minlength=offsets[-1] + 1)[:offsets[-1]]) - 1
+    # Slopes per reported step; a segment's last point only meets w = 0
+    w = (grid_t - t[left]) / np.maximum(_step_deltas(t), 1.0)[left]
+
+    out = {"mmsi": np.repeat(columns["mmsi"][seg_offsets[:-1]], counts), "t": grid_t}
+    if method == "great_circle":
+        out["lat"], out["lon"] = _slerp_lat_lon(columns["lat"], columns["lon"], left, w)
+    else:
+        out["lat"] = columns["lat"][left] + _step_deltas(columns["lat"])[left] * w
+        out["lon"] = _wrap_degrees(columns["lon"][left] + _step_deltas(columns["lon"], 360.0)[left] * w, -180.0)
+    out["speed"] = columns["speed"][left] + _step_deltas(columns["speed"])[left] * w
+    out["course"] = _wrap_degrees(columns["course"][left] + _step_deltas(columns["course"], 360.0)[left] * w, 0.0)
+    return out, offsets
+
+def build_track_trajectories(columns, offsets):
+    """Feature arrays per trajectory from sorted columns, plus the vessel index of each.
+
+    With SEGMENT_GAP_S / RESAMPLE_INTERVAL_S unset every vessel is one
+    trajectory; otherwise tracks are split at gaps, resampled and fragments
+    shorter than MIN_SEGMENT_POINTS dropped. Returns (trajectories,
+    traj_vessel, kept point count).
+    """
+    if SEGMENT_GAP_S is None and RESAMPLE_INTERVAL_S is None:
+        return build_features_columnar(columns, offsets), np.arange(len(offsets) - 1), int(offsets[-1])
+    resample = RESAMPLE_INTERVAL_S is not None
+    # Resampled length depends on the time span, so only single points go before the grid
+    columns, offsets, traj_vessel = segment_track_columns(
+        columns, offsets, SEGMENT_GAP_S, min_points=2 if resample else MIN_SEGMENT_POINTS
+    )
+    if resample:
+        columns, offsets = resample_track_columns(columns, offsets, RESAMPLE_INTERVAL_S, RESAMPLE_METHOD)
+        columns, offsets, traj_vessel = drop_short_segments(columns, offsets, traj_vessel, MIN_SEGMENT_POINTS)
+    return build_features_columnar(columns, offsets), traj_vessel, int(offsets[-1])
+
+def is_train_vessel(mmsi, train_size=TRAIN_RATIO):
+    # Fixed per MMSI, whatever else was loaded; the upper CRC bits are independent
+    # of the hash % NUM_SHARDS shard index in preprocess_incremental.py
+    return (mmsi_hash(mmsi) >> 16) % 100 < int(train_size * 100)
+
+def split_trajectories_by_vessel(trajectories, traj_vessel, mmsis, train_size=TRAIN_RATIO):
+    """Train/test trajectories by vessel (is_train_vessel), so the segments of one vessel stay on one side.
+
+    traj_vessel[j] is the index into `mmsis` of trajectory j (non-decreasing).
+    preprocess.py, preprocess_async.py and the incremental shards all split here.
+    """
+    train = np.array([is_train_vessel(mmsi, train_size) for mmsi in mmsis], dtype=bool)
+    bounds = np.searchsorted(traj_vessel, np.arange(len(mmsis) + 1))
+
+    def pick(vessels):
+        return [trajectories[j] for i in vessels for j in range(bounds[i], bounds[i + 1])]
+
+    return pick(np.flatnonzero(train)), pick(np.flatnonzero(~train))
 
 def count_ship_types(records):
     counts = Counter()
@@ -222,59 +753,107 @@ def count_ship_types(records):
 def sorted_ship_type_counts(counts):
     return sorted(counts.items(), key=lambda x: x[1], reverse=True)
 
-def build_trajectories(records):
-    traj_map = {}
-    for r in tqdm(records, desc="Building trajectories"):
-        ship_type = r.get("SHIPTYPE", r.get("shiptype"))
-        if SHIPTYPE_FILTER is not None and str(ship_type) != str(SHIPTYPE_FILTER):
-            continue
-        mmsi = r.get("MMSI")
-        lat = _to_float(r.get("LAT"))
-        lon = _to_float(r.get("LON"))
-        speed = _to_float(r.get("SPEED"))
-        course = _to_float(r.get("COURSE"))
-        ts = r.get("TIMESTAMP")
-        if mmsi is None or lat is None or lon is None or speed is None or course is None:
-            continue
-        traj_map.setdefault(mmsi, []).append((ts, lat, lon, speed, course))
-    return traj_map
-    
-def build_features(traj_map):
-    trajectories = []
-    for mmsi, trajectory in traj_map.items():
-        trajectory.sort(key=lambda x: x[0] or "")
-        arr = np.array([[p[1], p[2], p[3], p[4]] for p in trajectory], dtype=np.float32)
-        arr = append_step_distance_feature(arr)
-        trajectories.append(lat_lon_rate_transform(arr))
-    return trajectories
+def mmsi_hash(mmsi):
+    return zlib.crc32(str(mmsi).encode("utf-8"))
+
+def save_npz(path, **arrays):
+    """np.savez with fixed zip entry timestamps, so equal arrays give identical files."""
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_STORED, allowZip64=True) as zf:
+        for name, arr in arrays.items():
+            info = zipfile.ZipInfo(f"{name}.npy", date_time=(1980, 1, 1, 0, 0, 0))
+            with zf.open(info, "w", force_zip64=True) as f:
+                np.lib.format.write_array(f, np.asanyarray(arr), allow_pickle=False)
 
 def make_windows(trajs, seq_len):
-    X, y = [], []
+    # One gather over a sliding-window view of the concatenated trajectories
+    return TrajectoryWindows(trajs, seq_len, n_features=len(FEATURE_NAMES)).materialize()
+
+class RunningStats(object):
+    """Streaming per-feature mean/std (Welford, batched with Chan's update).
+
+    update() takes [N, F] batches, merge() combines accumulators built on
+    other workers or shards; std is the population std, as np.std.
+    """
+
+    def __init__(self, n_features=len(NORM_FEATURE_IDX)):
+        self.count = 0
+        self.mean = np.zeros(n_features, dtype=np.float64)
+        self.m2 = np.zeros(n_features, dtype=np.float64)
+
+    def update(self, x):
+        x = np.asarray(x, dtype=np.float64).reshape(-1, self.mean.shape[0])
+        if x.shape[0] == 0:
+            return self
+        batch = RunningStats(self.mean.shape[0])
+        batch.count = x.shape[0]
+        batch.mean = x.mean(axis=0)
+        batch.m2 = ((x - batch.mean) ** 2).sum(axis=0)
+        return self.merge(batch)
+
+    def merge(self, other):
+        if other.count == 0:
+            return self
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean = self.mean + delta * (other.count / total)
+        self.m2 = self.m2 + other.m2 + delta ** 2 * (self.count * other.count / total)
+        self.count = total
+        return self
+
+    def std(self):
+        return np.sqrt(self.m2 / self.count) if self.count else np.ones_like(self.m2)
+
+    def to_feature_stats(self, feature_idx=NORM_FEATURE_IDX):
+        # {"speed": {"mean", "std"}, ...} as used by norm()/denorm()
+        stats = {}
+        for i, idx in enumerate(feature_idx):
+            std = float(self.std()[i])
+            if std < 1e-8:
+                std = 1.0
+            stats[FEATURE_NAMES[idx]] = {"mean": float(self.mean[i]), "std": std}
+        return stats
+
+def trajectory_feature_stats(trajs, seq_len=SEQ_LEN, feature_idx=NORM_FEATURE_IDX):
+    """Accumulate stats once per point over trajectories long enough to yield windows."""
+    acc = RunningStats(len(feature_idx))
     for traj in trajs:
-        if traj.shape[0] < seq_len + 1:
-            continue
-        for i in range(traj.shape[0] - seq_len):
-            X.append(traj[i:i + seq_len])
-            y.append(traj[i + seq_len])
-    return np.array(X), np.array(y)
-
-def normalize_selected_features(X_train, y_train, X_test, y_test, feature_idx=(2, 3)):
-    """Normalize selected feature columns using train-set stats only."""
-    stats = {}
-
-    for idx in feature_idx:
-        mean = float(np.mean(X_train[:, :, idx]))
-        std = float(np.std(X_train[:, :, idx]))
-        if std < 1e-8:
-            std = 1.0
-        fname = FEATURE_NAMES[idx]
-        stats[fname] = {"mean": mean, "std": std}
+        if traj.shape[0] > seq_len:
+            acc.update(traj[:, list(feature_idx)])
+    return acc
 
-    X_train_norm = norm(X_train.copy(), stats)
-    y_train_norm = norm(y_train.copy(), stats)
-    X_test_norm = norm(X_test.copy(), stats)
-    y_test_norm = norm(y_test.copy(), stats)
-    return X_train_norm, y_train_norm, X_test_norm, y_test_norm, stats
+def build_dataset_arrays(train_trajs, test_trajs, dataset_format=None):
+    """data.npz arrays in `dataset_format` ("lazy" or "windows", default DATASET_FORMAT), not yet normalized.
+
+    Returns (arrays, n_train, n_test) in windows.
+    """
+    dataset_format = DATASET_FORMAT if dataset_format is None else dataset_format
+    if dataset_format == "lazy":
+        train = TrajectoryWindows(train_trajs, SEQ_LEN, n_features=len(FEATURE_NAMES))
+        test = TrajectoryWindows(test_trajs, SEQ_LEN, n_features=len(FEATURE_NAMES))
+        arrays = {
+            "train_points": train.buffer,
+            "train_starts": train.starts,
+            "test_points": test.buffer,
+            "test_starts": test.starts,
+            "seq_len": SEQ_LEN,
+        }
+        return arrays, len(train), len(test)
+    X_train, y_train = make_windows(train_trajs, SEQ_LEN)
+    X_test, y_test = make_windows(test_trajs, SEQ_LEN)
+    return {"X_train": X_train, "y_train": y_train, "X_test": X_test, "y_test": y_test}, len(X_train), len(X_test)
+
+def normalize_dataset_arrays(arrays, feature_stats):
+    # In place: buffers and windows from build_dataset_arrays are fresh copies
+    for name in ("train_points", "test_points", "X_train", "y_train", "X_test", "y_test"):
+        if name in arrays:
+            norm(arrays[name], feature_stats)
+    return arrays
+
+def save_dataset(arrays, feature_stats, output_npz=OUTPUT_NPZ, norm_stats_json=NORM_STATS_JSON):
+    # data.npz + norm_stats.json, shared by preprocess.py, preprocess_async.py and preprocess_incremental.py
+    save_npz(output_npz, **arrays)
+    with open(norm_stats_json, "w", encoding="utf-8") as f:
+        json.dump(build_norm_stats_payload(feature_stats), f, indent=2)
 
 def build_norm_stats_payload(feature_stats):
     return {
@@ -299,7 +878,14 @@ def main():
     """
     
     t0 = time.perf_counter()
-    traj_map, ship_type_counts, valid_point_count = load_trajectory_map_from_db()
+    if DB_READ_WORKERS > 1:
+        columns, ship_type_counts, valid_point_count = load_track_columns_partitioned()
+    elif DB_LOAD_MODE == "grouped":
+        columns, ship_type_counts, valid_point_count = load_grouped_track_columns_from_db()
+    elif DB_LOAD_MODE == "raw":
+        columns, ship_type_counts, valid_point_count = load_raw_track_columns_from_db()
+    else:
+        columns, ship_type_counts, valid_point_count = load_track_columns_from_db()
     t1 = time.perf_counter()
     print(f"Loaded valid points: {valid_point_count}")
     t2 = time.perf_counter()
@@ -314,53 +900,44 @@ def main():
         print(f"  {ship_type}: {cnt}")
     """
     
-    trajectories = build_features(traj_map)
+    columns, mmsis, offsets = sort_track_columns(columns)
+    if DEDUP_POINTS:
+        n_dup = valid_point_count - int(offsets[-1])
+        print(f"Dropped duplicate (MMSI, TIMESTAMP) points: {n_dup} ({n_dup / max(1, valid_point_count):.1%}), kept {int(offsets[-1])}")
+    trajectories, traj_vessel, n_points = build_track_trajectories(columns, offsets)
     t3 = time.perf_counter()
     if SHIPTYPE_FILTER is not None:
         print(f"Filtered ship type: {SHIPTYPE_FILTER}")
-    print(f"Built trajectories: {len(trajectories)}")
+    print(f"Built trajectories: {len(trajectories)} from {len(mmsis)} vessels")
+    if SEGMENT_GAP_S is not None or RESAMPLE_INTERVAL_S is not None:
+        print(
+            f"Segmented at {SEGMENT_GAP_S}s gaps, resampled every {RESAMPLE_INTERVAL_S}s: "
+            f"{int(offsets[-1])} -> {n_points} points"
+        )
     
-    traj_indices = np.arange(len(trajectories))
-    train_idx, test_idx = train_test_split(traj_indices, train_size=TRAIN_RATIO, random_state=42)
-    train_trajs = [trajectories[i] for i in train_idx]
-    test_trajs = [trajectories[i] for i in test_idx]
+    train_trajs, test_trajs = split_trajectories_by_vessel(trajectories, traj_vessel, mmsis)
 
-    X_train, y_train = make_windows(train_trajs, SEQ_LEN)
-    X_test, y_test = make_windows(test_trajs, SEQ_LEN)
+    arrays, n_train, n_test = build_dataset_arrays(train_trajs, test_trajs)
     t4 = time.perf_counter()
 
-    print(f"Train samples: {len(X_train)}, Test samples: {len(X_test)}")
+    print(f"Train samples: {n_train}, Test samples: {n_test}")
 
-    if len(X_train) == 0:
+    if n_train == 0:
         raise RuntimeError("No training samples generated.")
 
-    X_train, y_train, X_test, y_test, feature_stats = normalize_selected_features(
-        X_train, y_train, X_test, y_test, feature_idx=NORM_FEATURE_IDX
-    )
+    # Train-set stats, one pass over the unique points
+    feature_stats = trajectory_feature_stats(train_trajs).to_feature_stats()
+    normalize_dataset_arrays(arrays, feature_stats)
     t5 = time.perf_counter()
-    X_mean = np.zeros(len(FEATURE_NAMES), dtype=np.float32)
-    X_std = np.ones(len(FEATURE_NAMES), dtype=np.float32)
-    for fname, stat in feature_stats.items():
-        idx = FEATURE_INDEX[fname]
-        X_mean[idx] = stat["mean"]
-        X_std[idx] = stat["std"]
 
     if not UPDATE_DATA:
         return
     
-    np.savez(
-        OUTPUT_NPZ,
-        X_train=X_train,
-        y_train=y_train,
-        X_test=X_test,
-        y_test=y_test,
-    )
-    with open(NORM_STATS_JSON, "w", encoding="utf-8") as f:
-        json.dump(build_norm_stats_payload(feature_stats), f, indent=2)
+    save_dataset(arrays, feature_stats, OUTPUT_NPZ, NORM_STATS_JSON)
     t6 = time.perf_counter()
     print(f"Saved: {OUTPUT_NPZ}")
     print(f"Saved normalization stats: {NORM_STATS_JSON}")
-    print(f"Timing load_trajectory_map_from_db: {t1 - t0:.2f}s")
+    print(f"Timing load_track_columns_from_db: {t1 - t0:.2f}s")
     print(f"Timing count_ship_types: {t2 - t1:.2f}s")
     print(f"Timing build_trajectories: {t3 - t2:.2f}s")
     print(f"Timing make_windows/split: {t4 - t3:.2f}s")
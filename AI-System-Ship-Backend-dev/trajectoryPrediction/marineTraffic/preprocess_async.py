@@ -1,13 +1,11 @@
 import argparse
 import asyncio
-import json
 import sys
 import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
-import numpy as np
-from sklearn.model_selection import train_test_split
-
 # Ensure project root is on sys.path for local imports
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 if str(PROJECT_ROOT) not in sys.path:
@@ -21,6 +19,10 @@ try:
 except ImportError:
     AsyncIOMotorClient = None
 
+# Pipeline settings (load_track_columns_async)
+ASYNC_QUEUE_SIZE = 4  # Fetched batches buffered ahead of the parsers
+ASYNC_PARSERS = 1  # Parser tasks; each converts one batch at a time
+
 
 async def load_records_from_db_async(
     db_name=None,
@@ -89,69 +91,197 @@ async def load_records_from_db_async(
     return records
 
 
+def parse_snapshot_batch(docs, shiptype_filter=None):
+    """Snapshot documents -> (columnar chunk, ship type counts).
+
+    Runs in an executor (thread or process), so it only uses its arguments.
+    """
+    points = (
+        d
+        for doc in docs
+        for d in (doc.get("data") or [])
+        if pp.shiptype_matches(d, shiptype_filter)
+    )
+    return pp._point_columns_from_cursor(points)
+
+
+async def pipeline_columns(cursor, batch_size, queue_size=ASYNC_QUEUE_SIZE, parsers=ASYNC_PARSERS, executor=None):
+    """Overlap cursor fetches with parsing through a bounded asyncio.Queue.
+
+    One producer awaits `cursor.to_list(batch_size)` and queues each batch;
+    `parsers` consumer tasks convert batches in `executor` (None: the
+    loop's default thread pool; a ProcessPoolExecutor parses in parallel).
+    While a batch is parsed the next fetch is already in flight, and a full
+    queue pauses fetching. Chunks are reassembled in fetch order.
+
+    Returns (columns, ship_type_counts, stats) with per-stage busy time,
+    throughput and overlap efficiency (share of the shorter stage hidden
+    behind the longer one).
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=queue_size)
+    shiptype_filter = None if pp.SHIPTYPE_FILTER is None else str(pp.SHIPTYPE_FILTER)
+    chunks = {}
+    stats = {"docs": 0, "batches": 0, "fetch_s": 0.0, "parse_s": 0.0}
+
+    async def produce():
+        index = 0
+        try:
+            while True:
+                f0 = time.perf_counter()
+                docs = await cursor.to_list(length=batch_size)
+                stats["fetch_s"] += time.perf_counter() - f0
+                if not docs:
+                    break
+                stats["docs"] += len(docs)
+                stats["batches"] += 1
+                await queue.put((index, docs))
+                index += 1
+        finally:
+            for _ in range(parsers):
+                await queue.put(None)
+
+    async def consume():
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            index, docs = item
+            p0 = time.perf_counter()
+            chunks[index] = await loop.run_in_executor(executor, parse_snapshot_batch, docs, shiptype_filter)
+            stats["parse_s"] += time.perf_counter() - p0
+
+    t0 = time.perf_counter()
+    tasks = [asyncio.ensure_future(produce())] + [asyncio.ensure_future(consume()) for _ in range(parsers)]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        # A failed stage must not leave the other side blocked on the queue
+        for task in tasks:
+            task.cancel()
+        raise
+    stats["wall_s"] = time.perf_counter() - t0
+
+    results = [chunks[i] for i in sorted(chunks)]
+    columns = pp.concat_track_columns([c for c, _ in results])
+    ship_type_counts = Counter()
+    for _, counts in results:
+        ship_type_counts.update(counts)
+
+    stats["points"] = int(columns["t"].shape[0])
+    stats["fetch_docs_per_s"] = stats["docs"] / stats["fetch_s"] if stats["fetch_s"] > 0 else 0.0
+    stats["parse_points_per_s"] = stats["points"] / stats["parse_s"] if stats["parse_s"] > 0 else 0.0
+    shorter = min(stats["fetch_s"], stats["parse_s"])
+    hidden = stats["fetch_s"] + stats["parse_s"] - stats["wall_s"]
+    stats["overlap_efficiency"] = max(0.0, min(1.0, hidden / shorter)) if shorter > 0 else 0.0
+    return columns, ship_type_counts, stats
+
+
+async def load_track_columns_async(
+    db_name=None,
+    collection_name=None,
+    skip=None,
+    batch_size=None,
+    queue_size=ASYNC_QUEUE_SIZE,
+    parsers=ASYNC_PARSERS,
+    parse_processes=0,
+):
+    """Columnar counterpart of load_records_from_db_async (see pipeline_columns).
+
+    parse_processes > 0 parses in a process pool of that size instead of
+    threads. Returns (columns, ship_type_counts, stats); without motor,
+    falls back to the sync pp.load_track_columns_from_db() with stats None.
+    """
+    if AsyncIOMotorClient is None:
+        print("motor not installed; falling back to sync load_track_columns_from_db().")
+        columns, ship_type_counts, _ = pp.load_track_columns_from_db()
+        return columns, ship_type_counts, None
+
+    db_name = pp.DB_NAME if db_name is None else db_name
+    collection_name = pp.COLLECTION_NAME if collection_name is None else collection_name
+    skip = pp.DB_SKIP_DOCS if skip is None else skip
+    batch_size = 2048 if batch_size is None else batch_size
+
+    client = AsyncIOMotorClient(MONGO_URL, maxPoolSize=64)
+    col = client[db_name][collection_name]
+    # Skip over all snapshots before the SHIPTYPE filter, like build_point_pipeline
+    first = await col.find({}, {"_id": 1}).sort("_id", 1).skip(skip).limit(1).to_list(length=1)
+    query = pp.snapshot_query((first[0]["_id"], None) if first else None)
+    # _id order, like build_point_pipeline, so ties keep snapshot order
+    cursor = col.find(query, {"data": 1, "_id": 0}).sort("_id", 1).batch_size(batch_size)
+    executor = ProcessPoolExecutor(parse_processes) if parse_processes > 0 else None
+    try:
+        return await pipeline_columns(cursor, batch_size, queue_size, max(parsers, parse_processes), executor)
+    finally:
+        cursor.close()
+        client.close()
+        if executor is not None:
+            executor.shutdown()
+
+
+def print_pipeline_stats(stats):
+    print(
+        f"fetch: {stats['fetch_s']:.2f}s busy, {stats['docs']} docs in {stats['batches']} batches "
+        f"({stats['fetch_docs_per_s']:.0f} docs/s)"
+    )
+    print(f"parse: {stats['parse_s']:.2f}s busy, {stats['points']} points ({stats['parse_points_per_s']:.0f} points/s)")
+    print(f"pipeline wall: {stats['wall_s']:.2f}s, overlap efficiency: {stats['overlap_efficiency']:.0%}")
+
+
 async def run_async_preprocess(
     sample_records=0,
     save=False,
     batch_size=2048,
-    progress_every=200,
-    estimate_total=False,
+    queue_size=ASYNC_QUEUE_SIZE,
+    parsers=ASYNC_PARSERS,
+    parse_processes=0,
 ):
     t0 = time.perf_counter()
-    records = await load_records_from_db_async(
+    columns, ship_type_counts, stats = await load_track_columns_async(
         batch_size=batch_size,
-        progress_every=progress_every,
-        estimate_total=estimate_total,
+        queue_size=queue_size,
+        parsers=parsers,
+        parse_processes=parse_processes,
     )
     t1 = time.perf_counter()
+    if stats is not None:
+        print_pipeline_stats(stats)
 
     if sample_records and sample_records > 0:
-        records = records[:sample_records]
+        columns = {name: arr[:sample_records] for name, arr in columns.items()}
 
-    ship_type_counts = pp.count_ship_types(records)
     sorted_counts = pp.sorted_ship_type_counts(ship_type_counts)
     if sorted_counts:
         most_type, most_cnt = sorted_counts[0]
         print(f"Most common ship type: {most_type} ({most_cnt})")
     t2 = time.perf_counter()
 
-    trajectories = pp.build_trajectories(records)
+    columns, mmsis, offsets = pp.sort_track_columns(columns)
+    trajectories, traj_vessel, n_points = pp.build_track_trajectories(columns, offsets)
     t3 = time.perf_counter()
 
     if len(trajectories) == 0:
         raise RuntimeError("No trajectories built. Check DB data/filter settings.")
 
-    traj_indices = np.arange(len(trajectories))
-    train_idx, test_idx = train_test_split(
-        traj_indices, train_size=pp.TRAIN_RATIO, random_state=42
-    )
-    train_trajs = [trajectories[i] for i in train_idx]
-    test_trajs = [trajectories[i] for i in test_idx]
+    train_trajs, test_trajs = pp.split_trajectories_by_vessel(trajectories, traj_vessel, mmsis)
     t4 = time.perf_counter()
 
-    X_train, y_train = pp.make_windows(train_trajs, pp.SEQ_LEN)
-    X_test, y_test = pp.make_windows(test_trajs, pp.SEQ_LEN)
+    # Same DATASET_FORMAT layout as preprocess.main()
+    arrays, n_train, n_test = pp.build_dataset_arrays(train_trajs, test_trajs)
     t5 = time.perf_counter()
 
-    if len(X_train) == 0:
+    if n_train == 0:
         raise RuntimeError("No training samples generated.")
 
-    X_train, y_train, X_test, y_test, feature_stats = pp.normalize_selected_features(
-        X_train, y_train, X_test, y_test, feature_idx=pp.NORM_FEATURE_IDX
-    )
-
-    X_mean = np.zeros(len(pp.FEATURE_NAMES), dtype=np.float32)
-    X_std = np.ones(len(pp.FEATURE_NAMES), dtype=np.float32)
-    for fname, stat in feature_stats.items():
-        idx = pp.FEATURE_INDEX[fname]
-        X_mean[idx] = stat["mean"]
-        X_std[idx] = stat["std"]
+    feature_stats = pp.trajectory_feature_stats(train_trajs).to_feature_stats()
+    pp.normalize_dataset_arrays(arrays, feature_stats)
     t6 = time.perf_counter()
 
     print("Async preprocess timing")
-    print(f"records: {len(records)}")
+    print(f"points: {int(offsets[-1])} ({n_points} after segmenting/resampling)")
     print(f"trajectories: {len(trajectories)}")
-    print(f"train samples: {len(X_train)}, test samples: {len(X_test)}")
-    print(f"load_records_from_db_async: {t1 - t0:.2f}s")
+    print(f"train samples: {n_train}, test samples: {n_test}")
+    print(f"load_track_columns_async: {t1 - t0:.2f}s")
     print(f"count_ship_types: {t2 - t1:.2f}s")
     print(f"build_trajectories: {t3 - t2:.2f}s")
     print(f"split_trajectories: {t4 - t3:.2f}s")
@@ -160,15 +290,7 @@ async def run_async_preprocess(
     print(f"total(before save): {t6 - t0:.2f}s")
 
     if save:
-        np.savez(
-            pp.OUTPUT_NPZ,
-            X_train=X_train,
-            y_train=y_train,
-            X_test=X_test,
-            y_test=y_test,
-        )
-        with open(pp.NORM_STATS_JSON, "w", encoding="utf-8") as f:
-            json.dump(pp.build_norm_stats_payload(feature_stats), f, indent=2)
+        pp.save_dataset(arrays, feature_stats, pp.OUTPUT_NPZ, pp.NORM_STATS_JSON)
         t7 = time.perf_counter()
         print(f"saved_npz: {pp.OUTPUT_NPZ}")
         print(f"saved_norm_stats: {pp.NORM_STATS_JSON}")
@@ -182,7 +304,7 @@ def main():
         "--sample-records",
         type=int,
         default=0,
-        help="0 means use all loaded records.",
+        help="0 means use all loaded points.",
     )
     parser.add_argument(
         "--save",
@@ -196,15 +318,22 @@ def main():
         help="Async DB fetch batch size (larger is usually faster).",
     )
     parser.add_argument(
-        "--progress-every",
+        "--queue-size",
         type=int,
-        default=200,
-        help="Print progress every N docs; 0 disables progress logs.",
+        default=ASYNC_QUEUE_SIZE,
+        help="Fetched batches buffered ahead of the parsers.",
     )
     parser.add_argument(
-        "--estimate-total",
-        action="store_true",
-        help="Estimate total docs for progress reporting (extra DB call).",
+        "--parsers",
+        type=int,
+        default=ASYNC_PARSERS,
+        help="Parser tasks (threads of the default executor).",
+    )
+    parser.add_argument(
+        "--parse-processes",
+        type=int,
+        default=0,
+        help="Parse in a process pool of this size instead of threads; 0 disables.",
     )
     args = parser.parse_args()
 
@@ -213,8 +342,9 @@ def main():
             sample_records=args.sample_records,
             save=args.save,
             batch_size=args.batch_size,
-            progress_every=args.progress_every,
-            estimate_total=args.estimate_total,
+            queue_size=args.queue_size,
+            parsers=args.parsers,
+            parse_processes=args.parse_processes,
         )
     )
 
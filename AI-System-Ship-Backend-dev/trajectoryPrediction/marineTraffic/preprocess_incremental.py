@@ -0,0 +1,239 @@
+"""
+Incremental version of preprocess.main().
+
+Raw points are persisted per MMSI hash shard under INCREMENTAL_DIR together
+with that shard's (unnormalized) window arrays, and state.json records the
+_id of the last vesselPosition snapshot processed. A run reads only newer
+snapshots, merges their points into the affected shards, rebuilds those
+shards' windows and reassembles data.npz / norm_stats.json from all shards.
+
+Shards, train/test membership (preprocess.is_train_vessel, the split
+preprocess.main() uses) and point order (MMSI, then TIMESTAMP, ties in
+insertion order) do not depend on how the snapshots were batched, so
+incremental runs leave the same shard files and data.npz, byte for byte, as
+a --full rebuild. data.npz holds the same windows as preprocess.py's, in
+shard order instead of MMSI order.
+
+    python marineTraffic/preprocess_incremental.py          # new snapshots only
+    python marineTraffic/preprocess_incremental.py --full   # drop state, rebuild
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from bson import ObjectId
+from tqdm import tqdm
+
+# Ensure project root is on sys.path for local imports
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from database import get_db
+from marineTraffic import preprocess as pp
+from utils.windowing import TrajectoryWindows
+
+# USER SETTINGS
+INCREMENTAL_DIR = str(Path(__file__).resolve().parent / "incremental")
+NUM_SHARDS = 64
+
+RAW_DTYPE = np.dtype([
+    ("mmsi", "U16"),
+    ("ts", "U32"),
+    ("lat", "f8"),
+    ("lon", "f8"),
+    ("speed", "f8"),
+    ("course", "f8"),
+])
+SPLITS = ("train", "test")
+
+
+def shard_of(mmsi):
+    return pp.mmsi_hash(mmsi) % NUM_SHARDS
+
+
+def shard_dir(root, shard):
+    return Path(root) / f"shard_{shard:03d}"
+
+
+def _save_npy(path, arr):
+    # Write-then-rename so an interrupted run never leaves a torn file
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, arr)
+    os.replace(tmp, path)
+
+
+def load_state(root):
+    path = Path(root) / "state.json"
+    if not path.exists():
+        return {"last_id": None, "points": 0}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_state(root, state):
+    path = Path(root) / "state.json"
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, path)
+
+
+def load_new_points(after_id=None):
+    """Points from snapshots after `after_id`, grouped by shard.
+
+    Returns ({shard: RAW_DTYPE array in insertion order}, last snapshot _id).
+    """
+    col = get_db(pp.DB_NAME)[pp.COLLECTION_NAME]
+    pipeline = pp.build_point_pipeline(col, after_id=after_id)
+    rows = {}
+    last_id = after_id
+    cursor = col.aggregate(pipeline, allowDiskUse=True, batchSize=pp.DB_CURSOR_BATCH_SIZE)
+    for r in tqdm(cursor, desc="Loading new points"):
+        last_id = r["DOC_ID"]
+        mmsi = r.get("MMSI")
+        lat = pp._to_float(r.get("LAT"))
+        lon = pp._to_float(r.get("LON"))
+        speed = pp._to_float(r.get("SPEED"))
+        course = pp._to_float(r.get("COURSE"))
+        if mmsi is None or lat is None or lon is None or speed is None or course is None:
+            continue
+        ts = r.get("TIMESTAMP") or ""
+        rows.setdefault(shard_of(mmsi), []).append((str(mmsi), ts, lat, lon, speed, course))
+    return {shard: np.array(r, dtype=RAW_DTYPE) for shard, r in rows.items()}, last_id
+
+
+def merge_raw(old, new):
+    # Stable sort by (MMSI, TIMESTAMP): equal keys keep insertion order, old before new
+    raw = new if old is None else np.concatenate([old, new])
+    raw = raw[np.lexsort((raw["ts"], raw["mmsi"]))]
+    if pp.DEDUP_POINTS:
+        # First-loaded copy of each point, same as a --full rebuild
+        raw = raw[~pp.duplicate_point_mask(raw["mmsi"], raw["ts"], missing="")]
+    return raw
+
+
+def build_shard_windows(raw):
+    """{split: (points [N, 5], starts [M])} for one shard's sorted raw points."""
+    mmsis, first = np.unique(raw["mmsi"], return_index=True)
+    offsets = np.append(first, raw.shape[0]).astype(np.int64)
+    columns = {name: raw[name] for name in ("mmsi", "lat", "lon", "speed", "course")}
+    columns["t"] = pp.parse_timestamps(raw["ts"])
+    # Same segmentation / resampling as preprocess.main()
+    features, traj_vessel, _ = pp.build_track_trajectories(columns, offsets)
+    # Same per-MMSI split as preprocess.main(), so it does not depend on the shard
+    trajs = dict(zip(SPLITS, pp.split_trajectories_by_vessel(features, traj_vessel, mmsis)))
+    out = {}
+    for split in SPLITS:
+        windows = TrajectoryWindows(trajs[split], pp.SEQ_LEN, n_features=len(pp.FEATURE_NAMES))
+        out[split] = (windows.buffer, windows.starts)
+    return out
+
+
+def update_shard(root, shard, new_raw):
+    path = shard_dir(root, shard)
+    path.mkdir(parents=True, exist_ok=True)
+    raw_path = path / "raw.npy"
+    old = np.load(raw_path) if raw_path.exists() else None
+    raw = merge_raw(old, new_raw)
+    for split, (points, starts) in build_shard_windows(raw).items():
+        _save_npy(path / f"{split}_points.npy", points)
+        _save_npy(path / f"{split}_starts.npy", starts)
+    _save_npy(raw_path, raw)
+    # Duplicate points dropped by the merge
+    return (0 if old is None else old.shape[0]) + new_raw.shape[0] - raw.shape[0]
+
+
+def shard_feature_stats(points, starts):
+    # Stats over the points of trajectories that yield windows (rows covered by a window or its target)
+    covered = np.zeros(points.shape[0] + 1, dtype=np.int64)
+    np.add.at(covered, starts, 1)
+    np.add.at(covered, starts + pp.SEQ_LEN + 1, -1)
+    keep = np.cumsum(covered[:-1]) > 0
+    return pp.RunningStats().update(points[keep][:, list(pp.NORM_FEATURE_IDX)])
+
+
+def assemble(root):
+    """Concatenate every shard's windows.
+
+    Returns ({split: (points, starts)}, train RunningStats merged across shards).
+    """
+    shards = sorted(p for p in Path(root).glob("shard_*") if p.is_dir())
+    out = {}
+    train_stats = pp.RunningStats()
+    for split in SPLITS:
+        points, starts, offset = [], [], 0
+        for path in shards:
+            p = np.load(path / f"{split}_points.npy")
+            s = np.load(path / f"{split}_starts.npy")
+            if split == "train":
+                train_stats.merge(shard_feature_stats(p, s))
+            points.append(p)
+            starts.append(s + offset)
+            offset += p.shape[0]
+        out[split] = (
+            np.concatenate(points) if points else np.zeros((0, len(pp.FEATURE_NAMES)), dtype=np.float32),
+            np.concatenate(starts) if starts else np.zeros(0, dtype=np.int64),
+        )
+    return out, train_stats
+
+
+def write_dataset(data, train_stats, output_npz=pp.OUTPUT_NPZ, norm_stats_json=pp.NORM_STATS_JSON):
+    train_points, train_starts = data["train"]
+    if train_starts.shape[0] == 0:
+        raise RuntimeError("No training samples generated.")
+    feature_stats = train_stats.to_feature_stats()
+    arrays = {"seq_len": pp.SEQ_LEN}
+    for split in SPLITS:
+        points, starts = data[split]
+        arrays[f"{split}_points"] = points
+        arrays[f"{split}_starts"] = starts
+    # Fresh concatenations, safe to normalize in place
+    pp.save_dataset(pp.normalize_dataset_arrays(arrays, feature_stats), feature_stats, output_npz, norm_stats_json)
+    return feature_stats
+
+
+def run(root=INCREMENTAL_DIR, full=False):
+    t0 = time.perf_counter()
+    if full and Path(root).exists():
+        shutil.rmtree(root)
+    Path(root).mkdir(parents=True, exist_ok=True)
+    state = load_state(root)
+    after_id = ObjectId(state["last_id"]) if state["last_id"] else None
+
+    new_points, last_id = load_new_points(after_id)
+    t1 = time.perf_counter()
+    n_new = sum(arr.shape[0] for arr in new_points.values())
+    print(f"New points: {n_new} in {len(new_points)} shard(s) (after _id {state['last_id']})")
+
+    n_dup = sum(update_shard(root, shard, new_points[shard]) for shard in sorted(new_points))
+    print(f"Dropped duplicate (MMSI, TIMESTAMP) points: {n_dup}")
+    # Shards are written before the watermark moves
+    save_state(root, {"last_id": str(last_id) if last_id is not None else None, "points": state["points"] + n_new})
+    t2 = time.perf_counter()
+
+    data, train_stats = assemble(root)
+    print(f"Train samples: {data['train'][1].shape[0]}, Test samples: {data['test'][1].shape[0]}")
+    if pp.UPDATE_DATA:
+        write_dataset(data, train_stats)
+        print(f"Saved: {pp.OUTPUT_NPZ}")
+        print(f"Saved normalization stats: {pp.NORM_STATS_JSON}")
+    t3 = time.perf_counter()
+    print(f"Timing load new points: {t1 - t0:.2f}s")
+    print(f"Timing update shards: {t2 - t1:.2f}s")
+    print(f"Timing assemble/save: {t3 - t2:.2f}s")
+    print(f"Timing total: {t3 - t0:.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incremental preprocessing of ais_data_test.vesselPosition.")
+    parser.add_argument("--full", action="store_true", help="Drop the incremental state and rebuild from scratch.")
+    parser.add_argument("--dir", default=INCREMENTAL_DIR)
+    args = parser.parse_args()
+    run(root=args.dir, full=args.full)
@@ -9,8 +9,15 @@ PROJECT_ROOT = Path(__file__).resolve().parents[1]
 if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
 
+from marineTraffic import preprocess as pp
 from marineTraffic.preprocess import load_records_from_db
-from marineTraffic.preprocess_async import load_records_from_db_async
+from marineTraffic.preprocess_async import (
+    load_records_from_db_async,
+    load_track_columns_async,
+    parse_snapshot_batch,
+    pipeline_columns,
+    print_pipeline_stats,
+)
 
 
 def run_compare():
@@ -42,9 +49,97 @@ def run_compare():
         print("async_load: unavailable")
 
 
+class SimulatedCursor(object):
+    """Stands in for a motor cursor: synthetic snapshot batches, each
+    returned after `latency_s` (the network round trip)."""
+
+    def __init__(self, docs, vessels, latency_s):
+        self.remaining = docs
+        self.vessels = vessels
+        self.latency_s = latency_s
+        self.snap = 0
+
+    async def to_list(self, length):
+        await asyncio.sleep(self.latency_s)
+        n = min(length, self.remaining)
+        self.remaining -= n
+        docs = []
+        for _ in range(n):
+            minute = self.snap
+            docs.append({"data": [
+                {
+                    "MMSI": str(412000000 + v),
+                    "LAT": f"{25 + v * 1e-3 + minute * 1e-4:.6f}",
+                    "LON": f"{121 + minute * 1e-4:.6f}",
+                    "SPEED": "120",
+                    "COURSE": str(minute % 360),
+                    "TIMESTAMP": f"2026-02-06T{minute // 60 % 24:02d}:{minute % 60:02d}:00",
+                    "SHIPTYPE": pp.SHIPTYPE_FILTER or "70",
+                }
+                for v in range(self.vessels)
+            ]})
+            self.snap += 1
+        return docs
+
+
+async def serial_columns(cursor, batch_size):
+    # Old shape: await a batch, parse it inline, then fetch the next
+    chunks = []
+    while True:
+        docs = await cursor.to_list(length=batch_size)
+        if not docs:
+            break
+        chunks.append(parse_snapshot_batch(docs, None if pp.SHIPTYPE_FILTER is None else str(pp.SHIPTYPE_FILTER))[0])
+    return pp.concat_track_columns(chunks)
+
+
+def run_pipeline_compare(args):
+    if args.simulate:
+        def cursor():
+            return SimulatedCursor(args.docs, args.vessels, args.latency_ms / 1000.0)
+
+        s0 = time.perf_counter()
+        serial = asyncio.run(serial_columns(cursor(), args.batch_size))
+        serial_s = time.perf_counter() - s0
+        columns, _, stats = asyncio.run(
+            pipeline_columns(cursor(), args.batch_size, queue_size=args.queue_size, parsers=args.parsers)
+        )
+        same = all((serial[name] == columns[name]).all() for name in pp.TRACK_COLUMNS)
+        print(f"Simulated cursor: {args.docs} docs x {args.vessels} points, {args.latency_ms:.0f}ms per batch")
+        print(f"serial fetch+parse: {serial_s:.2f}s, identical columns: {same}")
+    else:
+        columns, _, stats = asyncio.run(
+            load_track_columns_async(
+                batch_size=args.batch_size,
+                queue_size=args.queue_size,
+                parsers=args.parsers,
+                parse_processes=args.parse_processes,
+            )
+        )
+        if stats is None:
+            print("pipeline stats unavailable (motor not installed)")
+            return
+    print("Fetch/parse pipeline")
+    print_pipeline_stats(stats)
+    print(f"speedup vs fetch-then-parse: {(stats['fetch_s'] + stats['parse_s']) / stats['wall_s']:.2f}x")
+
+
 def main():
-    argparse.ArgumentParser().parse_args()
-    run_compare()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pipeline", action="store_true", help="Report fetch/parse stage throughputs and overlap instead.")
+    parser.add_argument("--simulate", action="store_true", help="With --pipeline: synthetic cursor, no DB needed.")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--queue-size", type=int, default=4)
+    parser.add_argument("--parsers", type=int, default=1)
+    parser.add_argument("--parse-processes", type=int, default=0)
+    parser.add_argument("--docs", type=int, default=1024, help="Simulated snapshots.")
+    parser.add_argument("--vessels", type=int, default=200, help="Points per simulated snapshot.")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Simulated fetch time per batch.")
+    args = parser.parse_args()
+    if args.pipeline:
+        run_pipeline_compare(args)
+    else:
+        run_compare()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,81 @@
+"""
+Inference backends for the trajectory model.
+
+- eager:        BiGRU state dict from savedModel/ (training format)
+- torchscript:  traced module written by export_model.py (*.pt)
+- onnx:         ONNX graph written by export_model.py (*.onnx), run with
+                onnxruntime on CPU (optional dependency)
+- int8:         dynamically quantized (int8 GRU/Linear) TorchScript module
+                written by quantize_model.py (*_int8.pt), CPU only
+
+Every backend is called as model(x) with x a float32 tensor
+[B, SEQ_LEN, 5] and returns a [B, 5] tensor; use model_device() instead of
+next(model.parameters()) since the ONNX backend has no parameters.
+"""
+from pathlib import Path
+
+import torch
+
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+BACKENDS = ("eager", "torchscript", "onnx", "int8")
+BACKEND_SUFFIX = {"torchscript": ".pt", "onnx": ".onnx", "int8": "_int8.pt"}
+
+
+def exported_path(model_path, backend):
+    # savedModel/bigru_best.pth -> savedModel/bigru_best.pt / .onnx / _int8.pt
+    if backend == "eager":
+        return str(model_path)
+    path = Path(model_path)
+    return str(path.with_name(path.stem + BACKEND_SUFFIX[backend]))
+
+
+def model_device(model):
+    device = getattr(model, "device", None)
+    if device is not None:
+        return device
+    # Frozen TorchScript modules have no parameters; fall back to buffers, then CPU
+    for tensors in (model.parameters(), model.buffers()):
+        for t in tensors:
+            return t.device
+    return torch.device("cpu")
+
+
+class OnnxModel(object):
+    def __init__(self, path, num_threads=0):
+        if ort is None:
+            raise ImportError("onnxruntime not installed. Install with: uv add onnxruntime")
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(path, sess_options=options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        self.device = torch.device("cpu")
+
+    def __call__(self, x):
+        out = self.session.run(None, {self.input_name: x.detach().cpu().contiguous().numpy()})[0]
+        return torch.from_numpy(out)
+
+    def eval(self):
+        return self
+
+
+def load_exported(path, backend, device=None):
+    if backend == "torchscript":
+        model = torch.jit.load(path, map_location=device)
+        model.eval()
+        # export_model.py freezes the module, so there are no parameters to ask
+        model.device = torch.device("cpu") if device is None else torch.device(device)
+        return model
+    if backend == "onnx":
+        return OnnxModel(path)
+    if backend == "int8":
+        # Quantized kernels only run on CPU
+        model = torch.jit.load(path, map_location="cpu")
+        model.eval()
+        model.device = torch.device("cpu")
+        return model
+    raise ValueError(f"Unknown exported backend: {backend}. Expected one of {BACKENDS[1:]}")
@@ -0,0 +1,20 @@
+from models.bigru import BiGRU
+from models.gru import CausalGRU
+from config import model_config
+
+# MODEL_NAME -> 模型類別（savedModel/{MODEL_NAME}_best.pth）
+MODEL_CLASSES = {
+    "bigru": BiGRU,
+    "gru": CausalGRU,
+}
+
+def build_model(name=None):
+    name = model_config.MODEL_NAME if name is None else name
+    if name not in MODEL_CLASSES:
+        raise ValueError(f"Unknown model name: {name}. Expected one of {list(MODEL_CLASSES)}")
+    return MODEL_CLASSES[name](
+        input_size=model_config.MODEL_INPUT_SIZE,
+        hidden_size=model_config.MODEL_HIDDEN_SIZE,
+        num_layers=model_config.MODEL_NUM_LAYERS,
+        output_size=model_config.MODEL_OUTPUT_SIZE,
+    )
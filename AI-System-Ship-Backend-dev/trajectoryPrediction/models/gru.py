@@ -0,0 +1,18 @@
+import torch.nn as nn
+
+# 單向（因果）GRU 模型
+# 與 BiGRU 相同的輸入輸出，但只往前看，所以可以逐點更新 hidden state（見 streaming.py）。
+class CausalGRU(nn.Module):
+    def __init__(self, input_size=5, hidden_size=64, num_layers=2, output_size=5):
+        super().__init__()
+        self.gru = nn.GRU(input_size, hidden_size, num_layers, batch_first=True)
+        self.fc = nn.Linear(hidden_size, output_size)
+    def forward(self, x, h=None):
+        out, _ = self.gru(x, h)
+        out = out[:, -1, :]  # 取最後一個時間步
+        out = self.fc(out)
+        return out
+    def step(self, x, h=None):
+        # 單一時間步: x [B, input_size], h [num_layers, B, hidden_size] -> (out [B, output_size], h)
+        out, h = self.gru(x.unsqueeze(1), h)
+        return self.fc(out[:, -1, :]), h
@@ -0,0 +1,258 @@
+"""
+Fleet-wide next-point precompute job.
+
+Each cycle reads the vesselPosition snapshots fetched in the last
+PRECOMPUTE_WINDOW_MIN minutes, keeps the latest SEQ_LEN points of every
+vessel, runs the model over the whole fleet in chunks and bulk-upserts one
+document per MMSI into ais_data_test.vesselPrediction:
+
+    {mmsi, prediction: [lat, lon, speed, course, dist], last_timestamp,
+     model_version, predicted_at}
+
+src/routes/predictTraj.js serves these with one indexed lookup before
+falling back to on-demand prediction. Point MONGO_URL at a local mongod to
+test:
+
+    MONGO_URL=mongodb://127.0.0.1:27017 uv run precompute_predictions.py --once
+
+With --streaming (causal GRU, model_config.MODEL_NAME = "gru") the job keeps
+a streaming.StreamingPredictor across cycles and feeds it only the points
+newer than each vessel's last one, instead of re-running SEQ_LEN windows.
+--stream-capacity (default streaming.STREAM_CAPACITY) must cover every
+vessel in the window; a larger fleet fails the cycle.
+"""
+import argparse
+import logging
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import numpy as np
+from pymongo import ASCENDING, UpdateOne
+
+# Ensure project root is on sys.path for local imports
+PROJECT_ROOT = Path(__file__).resolve().parents[0]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from database import get_db
+from marineTraffic.preprocess import (
+    MISSING_TIME,
+    _to_float,
+    append_step_distance_feature,
+    denorm,
+    lat_lon_rate_transform,
+    norm,
+    parse_timestamps,
+    recover_next_lat_lon,
+)
+from predict_traj import NORM, SEQ_LEN, forward_batch, load_model, load_norm_stats
+from streaming import STREAM_CAPACITY, StreamingPredictor
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+# Settings
+DB_NAME = "ais_data_test"
+SOURCE_COLLECTION = "vesselPosition"
+PREDICTIONS_COLLECTION = "vesselPrediction"
+PRECOMPUTE_WINDOW_MIN = 120  # Snapshots read per cycle (fetched_at within this window)
+PRECOMPUTE_CHUNK_SIZE = 1024  # Vessels per forward pass
+PRECOMPUTE_WRITE_BATCH = 1000  # UpdateOne ops per bulk_write
+PRECOMPUTE_INTERVAL_S = 60  # Matches the 60 s polling in marineTraffic/vesselPosition.py
+
+
+def load_latest_tracks(col, window_min=PRECOMPUTE_WINDOW_MIN, now=None):
+    """Latest positions per MMSI from snapshots fetched in the last window.
+
+    Returns {mmsi: [(timestamp, lat, lon, speed, course), ...]} sorted by
+    timestamp. Snapshots overlap (each covers the last few minutes), so a
+    point reported in several of them is kept once.
+    """
+    now = datetime.now(timezone.utc) if now is None else now
+    cutoff = (now - timedelta(minutes=window_min)).isoformat()
+    projection = {
+        "_id": 0,
+        "data.MMSI": 1,
+        "data.LAT": 1,
+        "data.LON": 1,
+        "data.SPEED": 1,
+        "data.COURSE": 1,
+        "data.TIMESTAMP": 1,
+    }
+    points = {}
+    for doc in col.find({"fetched_at": {"$gte": cutoff}}, projection):
+        for d in doc.get("data", []):
+            mmsi = d.get("MMSI")
+            ts = d.get("TIMESTAMP")
+            lat = _to_float(d.get("LAT"))
+            lon = _to_float(d.get("LON"))
+            speed = _to_float(d.get("SPEED"))
+            course = _to_float(d.get("COURSE"))
+            if mmsi is None or ts is None or lat is None or lon is None or speed is None or course is None:
+                continue
+            points.setdefault(str(mmsi), {})[ts] = (ts, lat, lon, speed, course)
+    return {mmsi: sorted(by_ts.values()) for mmsi, by_ts in points.items()}
+
+
+def build_sequences(tracks, seq_len=SEQ_LEN, feature_norm_stats=None):
+    """Stack the last `seq_len` points of every long-enough track.
+
+    Returns (mmsis, last_timestamps, seq) with seq the normalized model
+    input [B, seq_len, 5]; shorter tracks are skipped.
+    """
+    mmsis, last_timestamps, seqs = [], [], []
+    for mmsi, track in tracks.items():
+        if len(track) < seq_len:
+            continue
+        # One extra point so the first window step has a real distance
+        recent = track[-(seq_len + 1):]
+        arr = np.array([p[1:] for p in recent], dtype=np.float32)
+        seqs.append(append_step_distance_feature(arr)[-seq_len:])
+        mmsis.append(mmsi)
+        last_timestamps.append(recent[-1][0])
+    if not seqs:
+        return mmsis, last_timestamps, np.zeros((0, seq_len, 5), dtype=np.float32)
+    seq = lat_lon_rate_transform(np.stack(seqs))
+    if feature_norm_stats is not None:
+        seq = norm(seq, feature_norm_stats)
+    return mmsis, last_timestamps, seq
+
+
+def predict_fleet(model, seq, feature_norm_stats=None, chunk_size=PRECOMPUTE_CHUNK_SIZE):
+    # [B, SEQ_LEN, 5] normalized -> [B, 5] physical units, chunk_size vessels per forward pass
+    preds = np.empty((seq.shape[0], 5), dtype=np.float32)
+    for start in range(0, seq.shape[0], chunk_size):
+        preds[start:start + chunk_size] = forward_batch(model, seq[start:start + chunk_size])
+    if feature_norm_stats is not None:
+        preds = denorm(preds, feature_norm_stats)
+    return recover_next_lat_lon(preds)
+
+
+def stream_tracks(streamer, tracks):
+    """Feed every vessel's points newer than its streamed state to `streamer`.
+
+    The k-th new point of all vessels goes in one update() call (so MMSIs
+    are unique). The store must hold the whole fleet: with more vessels than
+    slots, every round would evict states still needed by the next one, so
+    this raises ValueError instead. Returns (mmsis, last_timestamps, preds
+    [B, 5] physical units) for vessels that got new points and have a ready
+    prediction.
+    """
+    capacity = streamer.store.capacity
+    if len(tracks) > capacity:
+        raise ValueError(
+            f"{len(tracks)} vessels exceed the streaming store capacity ({capacity}); "
+            "raise --stream-capacity"
+        )
+    new = {}
+    for mmsi, track in tracks.items():
+        times = parse_timestamps([p[0] for p in track])
+        last = streamer.last_time(mmsi)
+        keep = times != MISSING_TIME if last is None else times > last
+        if keep.any():
+            new[mmsi] = (times[keep], np.array([p[1:] for p in track], dtype=np.float64)[keep], track[-1][0])
+    rounds = max((t.shape[0] for t, _, _ in new.values()), default=0)
+    for k in range(rounds):
+        batch = [mmsi for mmsi, (t, _, _) in new.items() if t.shape[0] > k]
+        streamer.update(batch, [new[m][0][k] for m in batch], np.stack([new[m][1][k] for m in batch]))
+
+    mmsis, last_timestamps, preds = [], [], []
+    for mmsi, (_, _, last_ts) in new.items():
+        pred = streamer.predict(mmsi)
+        if pred is not None:
+            mmsis.append(mmsi)
+            last_timestamps.append(last_ts)
+            preds.append(pred)
+    return mmsis, last_timestamps, np.array(preds, dtype=np.float32).reshape(-1, 5)
+
+
+def write_predictions(col, mmsis, last_timestamps, preds, model_version, batch_size=PRECOMPUTE_WRITE_BATCH):
+    predicted_at = datetime.now(timezone.utc)
+    ops = [
+        UpdateOne(
+            {"mmsi": mmsi},
+            {"$set": {
+                "mmsi": mmsi,
+                "prediction": pred.tolist(),
+                "last_timestamp": ts,
+                "model_version": model_version,
+                "predicted_at": predicted_at,
+            }},
+            upsert=True,
+        )
+        for mmsi, ts, pred in zip(mmsis, last_timestamps, preds)
+    ]
+    written = 0
+    for start in range(0, len(ops), batch_size):
+        result = col.bulk_write(ops[start:start + batch_size], ordered=False)
+        written += result.upserted_count + result.modified_count
+    return written
+
+
+def run_cycle(db, model, feature_norm_stats=None, window_min=PRECOMPUTE_WINDOW_MIN, chunk_size=PRECOMPUTE_CHUNK_SIZE, streamer=None):
+    t0 = time.perf_counter()
+    tracks = load_latest_tracks(db[SOURCE_COLLECTION], window_min)
+    if streamer is None:
+        mmsis, last_timestamps, seq = build_sequences(tracks, feature_norm_stats=feature_norm_stats)
+    t1 = time.perf_counter()
+    if streamer is None:
+        preds = predict_fleet(model, seq, feature_norm_stats, chunk_size)
+    else:
+        streamer.evict_idle(time.time())
+        mmsis, last_timestamps, preds = stream_tracks(streamer, tracks)
+    t2 = time.perf_counter()
+    written = write_predictions(db[PREDICTIONS_COLLECTION], mmsis, last_timestamps, preds, getattr(model, "version", None))
+    t3 = time.perf_counter()
+
+    n = len(mmsis)
+    total = t3 - t0
+    logger.info(
+        "Vessels seen: %d, predicted: %d, written: %d | load %.2fs, infer %.2fs, write %.2fs | %.1f vessels/s",
+        len(tracks), n, written, t1 - t0, t2 - t1, t3 - t2, n / total if total > 0 else 0.0,
+    )
+    return {
+        "vessels_seen": len(tracks),
+        "vessels_predicted": n,
+        "written": written,
+        "load_s": t1 - t0,
+        "infer_s": t2 - t1,
+        "write_s": t3 - t2,
+        "vessels_per_s": n / total if total > 0 else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute next-point predictions for every recent vessel.")
+    parser.add_argument("--once", action="store_true", help="Run a single cycle and exit.")
+    parser.add_argument("--window-min", type=float, default=PRECOMPUTE_WINDOW_MIN)
+    parser.add_argument("--chunk-size", type=int, default=PRECOMPUTE_CHUNK_SIZE)
+    parser.add_argument("--streaming", action="store_true", help="Keep per-vessel GRU states across cycles (causal GRU only).")
+    parser.add_argument("--stream-capacity", type=int, default=STREAM_CAPACITY, help="Vessels the streaming store holds; must cover the fleet.")
+    args = parser.parse_args()
+
+    db = get_db(DB_NAME)
+    db[SOURCE_COLLECTION].create_index([("fetched_at", ASCENDING)])
+    db[PREDICTIONS_COLLECTION].create_index([("mmsi", ASCENDING)], unique=True)
+    feature_norm_stats = load_norm_stats() if NORM else None
+    model = load_model()
+    streamer = StreamingPredictor(model, feature_norm_stats, capacity=args.stream_capacity) if args.streaming else None
+
+    while True:
+        try:
+            run_cycle(db, model, feature_norm_stats, args.window_min, args.chunk_size, streamer)
+        except Exception:
+            logger.exception("Precompute cycle failed")
+            if args.once:
+                raise
+        if args.once:
+            break
+        time.sleep(PRECOMPUTE_INTERVAL_S)
+
+
+if __name__ == "__main__":
+    main()
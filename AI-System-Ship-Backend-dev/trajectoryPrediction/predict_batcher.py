@@ -0,0 +1,144 @@
+"""
+Micro-batching request coalescer for the prediction model.
+
+Concurrent single-vessel requests submit their normalized input sequence
+([SEQ_LEN, 5]) and get a Future back. A worker thread collects items until
+`max_batch_size` is reached or `max_wait_ms` has passed since the oldest
+queued item arrived, runs them through the model as one [B, SEQ_LEN, 5]
+batch and fans the rows back out to the waiting callers.
+
+`max_wait_ms` is the latency bound added by coalescing: no item waits longer
+than that for its batch to close (plus the run time of a batch already in
+flight). `stats()` reports batch sizes and queue waits for tuning throughput
+against p99 latency.
+
+Futures cancelled while queued (client gone) are skipped. Items submitted
+before close() still run; later ones, or any left in the queue, fail with
+RuntimeError instead of waiting forever.
+"""
+import queue
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+
+import numpy as np
+
+_STOP = object()
+
+
+class MicroBatcher(object):
+    def __init__(self, batch_fn, max_batch_size=32, max_wait_ms=5.0, metrics_window=4096):
+        """`batch_fn` maps a stacked [B, ...] array to a [B, ...] result array."""
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_s = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._submit_lock = threading.Lock()
+        self._closed = False
+        self._batch_sizes = Counter()
+        self._queue_waits = deque(maxlen=metrics_window)
+        self._batch_times = deque(maxlen=metrics_window)
+        self._items = 0
+        self._batches = 0
+        self._thread = threading.Thread(target=self._run, name="MicroBatcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, item):
+        fut = Future()
+        with self._submit_lock:
+            if self._closed:
+                fut.set_exception(RuntimeError("MicroBatcher is closed"))
+                return fut
+            self._queue.put((item, fut, time.perf_counter()))
+        return fut
+
+    def close(self):
+        with self._submit_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._thread.join()
+        # Nothing can be queued after _STOP, but never leave a caller hanging
+        while True:
+            try:
+                entry = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is not _STOP and not entry[1].done():
+                entry[1].set_exception(RuntimeError("MicroBatcher is closed"))
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is _STOP:
+                break
+            batch = [first]
+            deadline = first[2] + self.max_wait_s
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is _STOP:
+                    stopping = True
+                    break
+                batch.append(entry)
+            self._run_batch(batch)
+
+    def _run_batch(self, batch):
+        # Drop futures cancelled while queued; the rest can no longer be cancelled
+        batch = [entry for entry in batch if entry[1].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        start = time.perf_counter()
+        items, futures, enqueued = zip(*batch)
+        try:
+            results = self.batch_fn(np.stack(items))
+        except Exception as e:
+            for fut in futures:
+                if not fut.done():
+                    fut.set_exception(e)
+            results = None
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self._batches += 1
+            self._items += len(batch)
+            self._batch_sizes[len(batch)] += 1
+            self._queue_waits.extend(start - t for t in enqueued)
+            self._batch_times.append(elapsed)
+
+        if results is not None:
+            for fut, result in zip(futures, results):
+                if not fut.done():
+                    fut.set_result(result)
+
+    def stats(self):
+        with self._lock:
+            waits_ms = np.array(self._queue_waits) * 1000.0
+            batch_ms = np.array(self._batch_times) * 1000.0
+            out = {
+                "batches": self._batches,
+                "items": self._items,
+                "mean_batch_size": self._items / self._batches if self._batches else 0.0,
+                "batch_size_counts": dict(sorted(self._batch_sizes.items())),
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait_s * 1000.0,
+            }
+        if waits_ms.size:
+            out["queue_wait_ms"] = {
+                "p50": float(np.percentile(waits_ms, 50)),
+                "p99": float(np.percentile(waits_ms, 99)),
+                "max": float(waits_ms.max()),
+            }
+        if batch_ms.size:
+            out["batch_time_ms"] = {
+                "p50": float(np.percentile(batch_ms, 50)),
+                "p99": float(np.percentile(batch_ms, 99)),
+            }
+        return out
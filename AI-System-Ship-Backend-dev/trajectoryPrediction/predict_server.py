@@ -0,0 +1,181 @@
+"""
+Resident prediction service.
+
+Loads the BiGRU model and norm stats once and answers prediction requests
+over local HTTP, so src/routes/predictTraj.js does not pay the torch import /
+model build / torch.load cold start on every request.
+
+    GET /predict?mmsi=41200006  -> {"mmsi": "...", "prediction": [lat, lon, speed, course, dist]}
+    POST /predict_batch {"mmsis": [...]}
+                                -> {"predictions": {mmsi: [...]}, "errors": {mmsi: "..."}}
+    POST /predict_path {"mmsis": [...], "horizon": K}
+                                -> {"paths": {mmsi: [[lat, lon, speed, course, dist] * K]}, "errors": {...}}
+    POST /reload                -> reload model + norm stats, drop cached predictions
+    GET /health                 -> {"status": "ok", "model_version": "..."}
+    GET /metrics                -> micro-batching, track and prediction cache stats
+
+Concurrent /predict requests are coalesced into one forward pass by
+predict_batcher.MicroBatcher; PREDICT_BATCH_WINDOW_MS=0 turns that off.
+"""
+import json
+import os
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+# Ensure project root is on sys.path for local imports
+PROJECT_ROOT = Path(__file__).resolve().parents[0]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import predict_traj
+from predict_batcher import MicroBatcher
+
+# Settings
+HOST = os.getenv("PREDICT_SERVER_HOST", "127.0.0.1")
+PORT = int(os.getenv("PREDICT_SERVER_PORT", "8765"))
+BATCH_WINDOW_MS = float(os.getenv("PREDICT_BATCH_WINDOW_MS", "5"))
+BATCH_MAX_SIZE = int(os.getenv("PREDICT_BATCH_MAX_SIZE", "32"))
+DEFAULT_HORIZON = 30
+MAX_HORIZON = 120
+
+
+class PredictionService(object):
+    def __init__(self, batch_window_ms=BATCH_WINDOW_MS, batch_max_size=BATCH_MAX_SIZE):
+        self.reload()
+        self.batcher = None
+        if batch_window_ms > 0:
+            self.batcher = MicroBatcher(
+                lambda seq: predict_traj.forward_batch(self.model, seq),
+                max_batch_size=batch_max_size,
+                max_wait_ms=batch_window_ms,
+            )
+
+    def reload(self):
+        t0 = time.perf_counter()
+        self.feature_norm_stats = predict_traj.load_norm_stats() if predict_traj.NORM else None
+        self.model = predict_traj.load_model()
+        predict_traj.PREDICTION_CACHE.clear()
+        self.load_time = time.perf_counter() - t0
+        return {"model_version": self.model.version, "load_time_s": self.load_time}
+
+    def predict(self, mmsi):
+        pred = predict_traj.predict_next_point(
+            mmsi,
+            model=self.model,
+            feature_norm_stats=self.feature_norm_stats,
+            batcher=self.batcher,
+        )
+        return pred.tolist()
+
+    def predict_path(self, mmsis, horizon):
+        batch_mmsis, paths, errors = predict_traj.predict_trajectories(
+            mmsis,
+            horizon,
+            model=self.model,
+            feature_norm_stats=self.feature_norm_stats,
+        )
+        return {mmsi: p.tolist() for mmsi, p in zip(batch_mmsis, paths)}, errors
+
+    def metrics(self):
+        return {
+            "batcher": self.batcher.stats() if self.batcher is not None else None,
+            "track_cache": predict_traj.TRACK_CACHE.stats(),
+            "track_sync": predict_traj.TRACK_SYNC.stats(),
+            "prediction_cache": predict_traj.PREDICTION_CACHE.stats(),
+            "model_version": self.model.version,
+        }
+
+    def predict_batch(self, mmsis):
+        predictions, errors = predict_traj.predict_next_points(
+            mmsis,
+            model=self.model,
+            feature_norm_stats=self.feature_norm_stats,
+        )
+        return {mmsi: p.tolist() for mmsi, p in predictions.items()}, errors
+
+
+def make_handler(service):
+    class PredictHandler(BaseHTTPRequestHandler):
+        def _send_json(self, status, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == "/health":
+                # predictTraj.js only serves precomputed predictions of this model_version
+                return self._send_json(200, {"status": "ok", "model_version": service.model.version})
+            if url.path == "/metrics":
+                return self._send_json(200, service.metrics())
+            if url.path != "/predict":
+                return self._send_json(404, {"error": "Not found"})
+
+            mmsi = parse_qs(url.query).get("mmsi", [None])[0]
+            if not mmsi:
+                return self._send_json(400, {"error": "Missing mmsi"})
+            try:
+                prediction = service.predict(mmsi)
+            except RuntimeError as e:
+                return self._send_json(422, {"error": str(e)})
+            except Exception as e:
+                return self._send_json(500, {"error": str(e)})
+            return self._send_json(200, {"mmsi": mmsi, "prediction": prediction})
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            if url.path == "/reload":
+                try:
+                    return self._send_json(200, service.reload())
+                except Exception as e:
+                    return self._send_json(500, {"error": str(e)})
+            if url.path not in ("/predict_batch", "/predict_path"):
+                return self._send_json(404, {"error": "Not found"})
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                mmsis = body.get("mmsis")
+                horizon = int(body.get("horizon", DEFAULT_HORIZON))
+            except (ValueError, TypeError, AttributeError):
+                return self._send_json(400, {"error": "Invalid JSON body"})
+            if not isinstance(mmsis, list) or not mmsis:
+                return self._send_json(400, {"error": "Missing mmsis"})
+            mmsis = [str(m) for m in mmsis]
+            try:
+                if url.path == "/predict_path":
+                    if not 0 < horizon <= MAX_HORIZON:
+                        return self._send_json(400, {"error": f"horizon must be in 1..{MAX_HORIZON}"})
+                    paths, errors = service.predict_path(mmsis, horizon)
+                    return self._send_json(200, {"paths": paths, "errors": errors})
+                predictions, errors = service.predict_batch(mmsis)
+            except Exception as e:
+                return self._send_json(500, {"error": str(e)})
+            return self._send_json(200, {"predictions": predictions, "errors": errors})
+
+        def log_message(self, format, *args):
+            print(f"{self.address_string()} {format % args}", file=sys.stderr, flush=True)
+
+    return PredictHandler
+
+
+def serve(host=HOST, port=PORT):
+    service = PredictionService()
+    print(f"Model loaded in {service.load_time:.2f}s", file=sys.stderr, flush=True)
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    print(f"Prediction server listening on http://{host}:{port}", file=sys.stderr, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    serve()
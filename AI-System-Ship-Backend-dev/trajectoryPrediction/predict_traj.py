@@ -1,20 +1,24 @@
 import os
 import json
 import sys
+import hashlib
 import numpy as np
 import torch
 from pathlib import Path
 
-from load_trajectories import fetch_trajectories_via_api
-from models.bigru import BiGRU
+from load_trajectories import TrackCache, run_concurrently
+from models.build import build_model
+from model_backends import BACKENDS, exported_path, load_exported, model_device
 from marineTraffic.preprocess import (
     norm,
     denorm,
     lat_lon_rate_transform,
     recover_next_lat_lon,
-    append_step_distance_feature,
 )
 from config import model_config
+from prediction_cache import PredictionCache
+from rollout import RolloutEngine
+from track_sync import TrackSync
 
 # Settings
 SEQ_LEN = model_config.SEQ_LEN
@@ -27,92 +31,227 @@ MODEL_NUM_LAYERS = model_config.MODEL_NUM_LAYERS
 MODEL_OUTPUT_SIZE = model_config.MODEL_OUTPUT_SIZE
 
 NORM = True  # Set to False to disable normalization
+# eager | torchscript | onnx | int8; exported backends need export_model.py
+# (torchscript, onnx) or quantize_model.py (int8) first
+PREDICT_BACKEND = os.getenv("PREDICT_BACKEND", "eager")
+ROLLOUT_CHUNK_SIZE = 1024  # Vessels per forward pass in predict_trajectories
+TRACK_CACHE_SIZE = 4096  # Max vessels kept in TRACK_CACHE
+TRACK_CACHE_TTL_S = 60.0  # Matches the 60 s AIS polling in marineTraffic/vesselPosition.py
+TRACK_RING_SIZE = 256  # Most recent points kept per vessel by TRACK_SYNC
 
+# Last SEQ_LEN parsed points per MMSI, shared by every prediction entry point
+TRACK_CACHE = TrackCache(max_size=TRACK_CACHE_SIZE, ttl_s=TRACK_CACHE_TTL_S)
+# On a cache miss, pulls only points newer than the last seen timestamp
+TRACK_SYNC = TrackSync(ring_size=TRACK_RING_SIZE, max_vessels=TRACK_CACHE_SIZE)
+# Next-point predictions keyed by (MMSI, newest point time, model version)
+PREDICTION_CACHE = PredictionCache(max_size=TRACK_CACHE_SIZE)
 
-def _extract_points(track):
-    # Extract [lat, lon, speed, course] from track entries
-    points = []
-    for e in track:
-        if not isinstance(e, dict):
-            continue
-        lat = None
-        lon = None
-        coord = e.get("coord")
-        if coord and len(coord) >= 2:
-            lat, lon = coord[0], coord[1]
-        speed = e.get("sog", e.get("SPEED", 0))
-        course = e.get("cog", e.get("COURSE", 0))
-        if lat is None or lon is None:
-            continue
-        points.append([float(lat), float(lon), float(speed), float(course)])
-    arr = np.array(points, dtype=np.float32)
-    return append_step_distance_feature(arr)
-
-
-def predict_next_point(mmsi):
-    # Load trajectories from DB and filter by MMSI
-    data = fetch_trajectories_via_api(mmsi)
-    if not data:
-        raise RuntimeError("No trajectory data returned from database")
-    # track = [e for e in data if str(e.get("MMSI")) == str(mmsi)]
-    # if not track:
-    #     raise RuntimeError("No trajectory points for given MMSI")
 
-    points = _extract_points(data)
+def load_norm_stats(norm_path=NORM_PATH):
+    # Load normalization stats written by marineTraffic/preprocess.py
+    if not os.path.exists(norm_path):
+        raise FileNotFoundError(f"Normalization stats not found: {norm_path}. Run marineTraffic/preprocess.py first.")
+    with open(norm_path, "r", encoding="utf-8") as f:
+        data_norm = json.load(f)
+    if "speed" in data_norm and "course" in data_norm and "dist" in data_norm:
+        return {
+            "speed": data_norm["speed"],
+            "course": data_norm["course"],
+            "dist": data_norm["dist"],
+        }
+    raise ValueError(
+        f"Invalid normalization stats format in {norm_path}. "
+        "Expected keys: speed, course, dist."
+    )
+
+
+def get_device():
+    return torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+
+def load_model(device=None, model_path=MODEL_PATH, backend=None):
+    device = get_device() if device is None else device
+    backend = PREDICT_BACKEND if backend is None else backend
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown PREDICT_BACKEND: {backend}. Expected one of {BACKENDS}")
+    if backend != "eager":
+        path = exported_path(model_path, backend)
+        if not os.path.exists(path):
+            script = "quantize_model.py" if backend == "int8" else "export_model.py"
+            raise FileNotFoundError(f"Exported model not found: {path}. Run {script} first.")
+        model = load_exported(path, backend, device=device)
+        model.version = model_version(path)
+        return model
+
+    model = build_model().to(device)
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(f"Model not found: {model_path}")
+    state = torch.load(model_path, map_location=device)
+    model.load_state_dict(state)
+    model.eval()
+    # Used as part of the PREDICTION_CACHE key
+    model.version = model_version(model_path)
+    return model
+
+
+def model_version(model_path=MODEL_PATH):
+    h = hashlib.sha1()
+    with open(model_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return f"{Path(model_path).name}:{h.hexdigest()[:12]}"
+
+
+def fetch_track(mmsi):
+    # Latest SEQ_LEN points of [lat, lon, speed, course, dist], oldest first,
+    # with the epoch time of the newest one. Only those are used, so only
+    # those are cached.
+    cached = TRACK_CACHE.get(mmsi)
+    if cached is not None:
+        return cached
+
+    last_time, points = TRACK_SYNC.refresh(mmsi, SEQ_LEN)
+    if points.shape[0] == 0:
+        raise RuntimeError("No trajectory data returned from database")
     if points.shape[0] < SEQ_LEN:
         raise RuntimeError("Not enough points for prediction")
+    points.flags.writeable = False
+    TRACK_CACHE.put(mmsi, (last_time, points))
+    return last_time, points
+
+
+def forward_batch(model, seq):
+    # seq: normalized model input [B, SEQ_LEN, 5] -> raw model output [B, 5]
+    device = model_device(model)
+    with torch.no_grad():
+        x = torch.from_numpy(np.ascontiguousarray(seq, dtype=np.float32)).to(device)
+        return model(x).cpu().numpy()
+
+
+def predict_next_point(mmsi, model=None, feature_norm_stats=None, batcher=None):
+    """Predict the next point for one MMSI.
+
+    `model` and `feature_norm_stats` are loaded from disk when not given;
+    long-lived callers (predict_server.py) pass them in to skip that cost.
+    With a `batcher` (predict_batcher.MicroBatcher) the forward pass is
+    coalesced with other concurrent requests instead of run alone.
+    Results are cached in PREDICTION_CACHE when the model has a `version`.
+    """
+    last_time, points = fetch_track(mmsi)
+    if model is None and batcher is None:
+        model = load_model()
+    version = getattr(model, "version", None)
+    if version is not None:
+        pred = PREDICTION_CACHE.get(mmsi, last_time, version)
+        if pred is not None:
+            return pred
 
     latest_point = points[-1].copy()
     seq = lat_lon_rate_transform(points[-SEQ_LEN:])
 
     # Load normalization if available
-    feature_norm_stats = None
     if NORM:
-        if not os.path.exists(NORM_PATH):
-            raise FileNotFoundError(f"Normalization stats not found: {NORM_PATH}. Run marineTraffic/preprocess.py first.")
-        with open(NORM_PATH, "r", encoding="utf-8") as f:
-            data_norm = json.load(f)
-        if "speed" in data_norm and "course" in data_norm and "dist" in data_norm:
-            feature_norm_stats = {
-                "speed": data_norm["speed"],
-                "course": data_norm["course"],
-                "dist": data_norm["dist"],
-            }
-        else:
-            raise ValueError(
-                f"Invalid normalization stats format in {NORM_PATH}. "
-                "Expected keys: speed, course, dist."
-            )
+        if feature_norm_stats is None:
+            feature_norm_stats = load_norm_stats()
         seq = norm(seq, feature_norm_stats)
 
-    
     # Model
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    model = BiGRU(
-        input_size=MODEL_INPUT_SIZE,
-        hidden_size=MODEL_HIDDEN_SIZE,
-        num_layers=MODEL_NUM_LAYERS,
-        output_size=MODEL_OUTPUT_SIZE,
-    ).to(device)
-    if not os.path.exists(MODEL_PATH):
-        raise FileNotFoundError(f"Model not found: {MODEL_PATH}")
-    state = torch.load(MODEL_PATH, map_location=device)
-    model.load_state_dict(state)
-    model.eval()
-
-    with torch.no_grad():
-        x = torch.tensor(seq, dtype=torch.float32, device=device).unsqueeze(0)
-        pred = model(x).squeeze(0).cpu().numpy()
+    if batcher is not None:
+        pred = batcher.submit(seq).result()
+    else:
+        pred = forward_batch(model, seq[np.newaxis])[0]
 
     if NORM:
         pred = denorm(pred, feature_norm_stats)
 
     pred = recover_next_lat_lon(pred, latest_point)
+    if version is not None:
+        PREDICTION_CACHE.put(mmsi, last_time, version, pred)
         
     print(f"latest_point: {latest_point.tolist()}", file=sys.stderr, flush=True)
     return pred
 
 
+def _gather_sequences(mmsis, feature_norm_stats=None):
+    # Fetch every vessel and stack the usable ones into one [B, SEQ_LEN, 5] input
+    # Track fetches are I/O bound, so run them on the pooled HTTP session concurrently
+    fetched, errors = run_concurrently(fetch_track, list(mmsis))
+    batch_mmsis = [mmsi for mmsi in mmsis if mmsi in fetched]
+    last_times = [fetched[mmsi][0] for mmsi in batch_mmsis]
+    seqs = [fetched[mmsi][1] for mmsi in batch_mmsis]
+    if not seqs:
+        return batch_mmsis, last_times, None, errors
+
+    seq = lat_lon_rate_transform(np.stack(seqs))
+    if NORM:
+        seq = norm(seq, feature_norm_stats)
+    return batch_mmsis, last_times, seq, errors
+
+
+def predict_next_points(mmsis, model=None, feature_norm_stats=None):
+    """Predict the next point for many MMSIs with one model forward pass.
+
+    Returns (predictions, errors): {mmsi: np.ndarray[5]} for vessels that
+    could be predicted and {mmsi: message} for the ones that could not
+    (no track, too few points, fetch error). One bad vessel never fails
+    the batch.
+    """
+    if NORM and feature_norm_stats is None:
+        feature_norm_stats = load_norm_stats()
+    batch_mmsis, last_times, seq, errors = _gather_sequences(mmsis, feature_norm_stats)
+    if seq is None:
+        return {}, errors
+
+    if model is None:
+        model = load_model()
+    version = getattr(model, "version", None)
+    predictions = {}
+    todo = []
+    for i, (mmsi, last_time) in enumerate(zip(batch_mmsis, last_times)):
+        pred = PREDICTION_CACHE.get(mmsi, last_time, version) if version is not None else None
+        if pred is None:
+            todo.append(i)
+        else:
+            predictions[mmsi] = pred
+    if not todo:
+        return predictions, errors
+
+    pred = forward_batch(model, seq[todo])
+
+    if NORM:
+        pred = denorm(pred, feature_norm_stats)
+    pred = recover_next_lat_lon(pred)
+
+    for i, p in zip(todo, pred):
+        predictions[batch_mmsis[i]] = p
+        if version is not None:
+            PREDICTION_CACHE.put(batch_mmsis[i], last_times[i], version, p)
+    return predictions, errors
+
+
+def predict_trajectories(mmsis, horizon, model=None, feature_norm_stats=None, chunk_size=ROLLOUT_CHUNK_SIZE):
+    """Roll `horizon` future points forward for many MMSIs.
+
+    Returns (batch_mmsis, paths, errors) where paths is a [B, horizon, 5]
+    array of [lat, lon, speed, course, dist] aligned with batch_mmsis.
+    Vessels are run through RolloutEngine in chunks of `chunk_size`.
+    """
+    if NORM and feature_norm_stats is None:
+        feature_norm_stats = load_norm_stats()
+    batch_mmsis, _, seq, errors = _gather_sequences(mmsis, feature_norm_stats)
+    if seq is None:
+        return batch_mmsis, np.zeros((0, horizon, MODEL_OUTPUT_SIZE), dtype=np.float32), errors
+
+    if model is None:
+        model = load_model()
+    engine = RolloutEngine(model, feature_norm_stats if NORM else None, seq_len=SEQ_LEN)
+    paths = np.empty((seq.shape[0], horizon, MODEL_OUTPUT_SIZE), dtype=np.float32)
+    for start in range(0, seq.shape[0], chunk_size):
+        end = start + chunk_size
+        paths[start:end] = engine.rollout(seq[start:end], horizon).cpu().numpy()
+    return batch_mmsis, paths, errors
+
+
 if __name__ == "__main__":
     sample_mmsi = os.getenv("MMSI", "41200006")
     pred = predict_next_point(sample_mmsi)
@@ -0,0 +1,65 @@
+"""
+Next-point prediction cache.
+
+Until a vessel reports a new position, its next-point prediction is
+deterministic, so results are cached per MMSI under the key
+(timestamp of the newest input point, model version). A lookup with a newer
+timestamp or a different model version is a miss and replaces the entry;
+clear() drops everything on model reload.
+"""
+import threading
+from collections import OrderedDict
+
+
+class PredictionCache(object):
+    def __init__(self, max_size=4096):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+
+    def get(self, mmsi, last_time, model_version):
+        key = str(mmsi)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] != (last_time, model_version):
+                # New data or a reloaded model since this was computed
+                del self._entries[key]
+                self.stale += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1].copy()
+
+    def put(self, mmsi, last_time, model_version, pred):
+        key = str(mmsi)
+        with self._lock:
+            self._entries[key] = ((last_time, model_version), pred.copy())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "stale": self.stale,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,67 @@
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+import torch
+import torch.nn as nn
+
+# Ensure project root is on sys.path for local imports
+PROJECT_ROOT = Path(__file__).resolve().parents[0]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from config import model_config
+from model_backends import exported_path, load_exported
+from predict_traj import MODEL_PATH, forward_batch, load_model
+
+SEQ_LEN = model_config.SEQ_LEN
+
+
+def quantize(model):
+    # int8 weights for the GRU and Linear matmuls; activations stay float
+    return torch.ao.quantization.quantize_dynamic(model, {nn.GRU, nn.Linear}, dtype=torch.qint8)
+
+
+def _latency(model, x, repeats=5):
+    with torch.no_grad():
+        model(x)
+        t0 = time.perf_counter()
+        for _ in range(repeats):
+            model(x)
+    return (time.perf_counter() - t0) / repeats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a dynamically quantized (int8) copy of a BiGRU checkpoint.")
+    parser.add_argument("--model-path", default=MODEL_PATH)
+    args = parser.parse_args()
+
+    model = load_model(device=torch.device("cpu"), model_path=args.model_path, backend="eager")
+    qmodel = quantize(model)
+    # Saved as TorchScript: quantized state dicts hold packed params that
+    # torch.load(weights_only=True) refuses to unpickle.
+    example = torch.zeros(1, SEQ_LEN, model_config.MODEL_INPUT_SIZE)
+    path = exported_path(args.model_path, "int8")
+    torch.jit.trace(qmodel, example).save(path)
+    loaded = load_exported(path, "int8")
+    # Serving entry point must run on the loaded module
+    out = forward_batch(loaded, torch.zeros(2, SEQ_LEN, model_config.MODEL_INPUT_SIZE).numpy())
+    if out.shape != (2, model_config.MODEL_OUTPUT_SIZE):
+        raise RuntimeError(f"int8 forward_batch returned shape {out.shape}")
+
+    fp32_mb = os.path.getsize(args.model_path) / 1e6
+    int8_mb = os.path.getsize(path) / 1e6
+    print(f"Saved int8: {path}")
+    print(f"Size: fp32 {fp32_mb:.1f}MB, int8 {int8_mb:.1f}MB ({fp32_mb / int8_mb:.1f}x smaller)")
+    for batch_size in (1, 64):
+        x = torch.randn(batch_size, SEQ_LEN, model_config.MODEL_INPUT_SIZE)
+        t_fp32 = _latency(model, x)
+        t_int8 = _latency(loaded, x)
+        print(f"Batch {batch_size}: fp32 {t_fp32 * 1000:.1f}ms, int8 {t_int8 * 1000:.1f}ms ({t_fp32 / t_int8:.1f}x)")
+    print("Run test.py to measure the accuracy loss in metres.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Multi-step autoregressive trajectory rollout.
+
+Predicts K future points for many vessels at once by feeding each step's
+output back in as the next model input. Everything stays in torch: the
+step distance feature (append_step_distance_feature) and normalization
+(norm) are recomputed on tensors, and the input windows are views into one
+preallocated [B, SEQ_LEN + K, 5] buffer, so no step round-trips through
+Python lists or allocates a new window.
+"""
+import torch
+
+from marineTraffic.preprocess import norm, denorm
+from model_backends import model_device
+
+EARTH_RADIUS_M = 6371000.0
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    # Tensor version of the haversine used by append_step_distance_feature
+    lat1, lon1, lat2, lon2 = (torch.deg2rad(v) for v in (lat1, lon1, lat2, lon2))
+    a = torch.sin((lat2 - lat1) / 2.0) ** 2 + torch.cos(lat1) * torch.cos(lat2) * torch.sin((lon2 - lon1) / 2.0) ** 2
+    return 2.0 * EARTH_RADIUS_M * torch.arcsin(torch.sqrt(a.clamp(0.0, 1.0)))
+
+
+class RolloutEngine(object):
+    def __init__(self, model, feature_norm_stats=None, seq_len=10):
+        self.model = model
+        self.feature_norm_stats = feature_norm_stats
+        self.seq_len = seq_len
+        self.device = model_device(model)
+        self._buf = None
+
+    def _buffer(self, batch_size, horizon):
+        # Reuse the buffer across calls while it is large enough
+        need = (batch_size, self.seq_len + horizon, 5)
+        if self._buf is None or self._buf.shape[0] < need[0] or self._buf.shape[1] < need[1]:
+            self._buf = torch.empty(need, dtype=torch.float32, device=self.device)
+        return self._buf[:batch_size, :need[1]]
+
+    def rollout(self, seq, horizon):
+        """Roll `horizon` steps forward from normalized inputs [B, SEQ_LEN, 5].
+
+        Returns a [B, K, 5] tensor of [lat, lon, speed, course, dist] in
+        physical units (degrees, dataset speed/course units, metres).
+        """
+        seq = torch.as_tensor(seq, dtype=torch.float32, device=self.device)
+        batch_size = seq.shape[0]
+        buf = self._buffer(batch_size, horizon)
+        buf[:, :self.seq_len].copy_(seq)
+
+        # lat_lon_rate_transform stores lat/90, lon/180
+        prev_lat = seq[:, -1, 0] * 90.0
+        prev_lon = seq[:, -1, 1] * 180.0
+        with torch.no_grad():
+            for k in range(horizon):
+                step = buf[:, self.seq_len + k]
+                step.copy_(self.model(buf[:, k:k + self.seq_len]))
+                step[:, 0].clamp_(-1.0, 1.0)
+                step[:, 1].clamp_(-1.0, 1.0)
+                lat = step[:, 0] * 90.0
+                lon = step[:, 1] * 180.0
+                step[:, 4] = haversine_m(prev_lat, prev_lon, lat, lon)
+                if self.feature_norm_stats is not None:
+                    norm(step, self.feature_norm_stats, features=("dist",))
+                prev_lat, prev_lon = lat, lon
+
+        out = buf[:, self.seq_len:].clone()
+        if self.feature_norm_stats is not None:
+            out = denorm(out, self.feature_norm_stats)
+        out[..., 0] *= 90.0
+        out[..., 1] *= 180.0
+        return out
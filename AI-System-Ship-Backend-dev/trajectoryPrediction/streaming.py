@@ -0,0 +1,195 @@
+"""
+Streaming next-point inference for the causal GRU (MODEL_NAME = "gru").
+
+The window path (predict_traj.py) re-runs the model over the last SEQ_LEN
+points every time a vessel reports. A unidirectional GRU can instead keep
+its hidden state per vessel, so each new AIS point costs a GRU step and no
+window is rebuilt. States for all vessels live in one preallocated tensor;
+an MMSI maps to a slot, and vessels that stop reporting are evicted (idle
+timeout, or the least recently seen one when the store is full).
+
+The model is trained on SEQ_LEN windows that start from a zero state, so a
+state carried forward forever drifts away from it. Each vessel has two
+states restarted in turn every `window` (SEQ_LEN) points; predictions come
+from the one that has seen `window` to 2 * `window` - 1 points, which is
+exactly the window model every `window` steps. A vessel's prediction is
+ready after `window` updates.
+"""
+import numpy as np
+import torch
+
+from config import model_config
+from marineTraffic.preprocess import norm, denorm, lat_lon_rate_transform, recover_next_lat_lon
+from model_backends import model_device
+from rollout import haversine_m
+
+STREAM_CAPACITY = 4096  # Max vessels holding a hidden state
+STREAM_IDLE_S = 3600.0  # Evict vessels with no new point for this long
+STREAM_PHASES = 2  # Hidden states per vessel, restarted in turn (StreamingPredictor._step)
+
+
+class HiddenStateStore(object):
+    """Per-MMSI GRU hidden states (STREAM_PHASES per vessel) in one preallocated tensor."""
+
+    def __init__(self, num_layers, hidden_size, capacity=STREAM_CAPACITY, device=None):
+        self.capacity = capacity
+        self.h = torch.zeros(STREAM_PHASES, num_layers, capacity, hidden_size, device=device)
+        self.last_latlon = np.zeros((capacity, 2), dtype=np.float64)  # raw degrees, for the dist feature
+        self.last_time = np.zeros(capacity, dtype=np.int64)
+        self.steps = np.zeros(capacity, dtype=np.int64)
+        self.slots = {}  # mmsi -> slot
+        self._mmsi_of = [None] * capacity
+        self._free = list(range(capacity - 1, -1, -1))
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.slots)
+
+    def _release(self, slot):
+        del self.slots[self._mmsi_of[slot]]
+        self._mmsi_of[slot] = None
+        self._free.append(slot)
+        self.evictions += 1
+
+    def assign(self, mmsis):
+        """Slots for `mmsis` (unique), allocating zeroed ones for new vessels."""
+        if len(mmsis) > self.capacity:
+            raise ValueError(f"{len(mmsis)} vessels in one batch exceed the store capacity ({self.capacity})")
+        slots = np.empty(len(mmsis), dtype=np.int64)
+        pinned = {self.slots[m] for m in mmsis if m in self.slots}
+        for i, mmsi in enumerate(mmsis):
+            slot = self.slots.get(mmsi)
+            if slot is None:
+                if not self._free:
+                    # Full: drop the least recently seen vessel not in this batch
+                    # (one exists, since the batch fits in the store)
+                    order = np.argsort(self.last_time, kind="stable")
+                    victim = next(int(s) for s in order if int(s) not in pinned and self._mmsi_of[s] is not None)
+                    self._release(victim)
+                slot = self._free.pop()
+                self.slots[mmsi] = slot
+                self._mmsi_of[slot] = mmsi
+                self.h[:, :, slot] = 0.0
+                self.steps[slot] = 0
+                self.last_time[slot] = 0
+                pinned.add(slot)
+            slots[i] = slot
+        return slots
+
+    def evict_idle(self, now, max_idle_s=STREAM_IDLE_S):
+        idle = [slot for slot in self.slots.values() if now - self.last_time[slot] > max_idle_s]
+        for slot in idle:
+            self._release(slot)
+        return len(idle)
+
+
+class StreamingPredictor(object):
+    def __init__(self, model, feature_norm_stats=None, capacity=STREAM_CAPACITY, window=model_config.SEQ_LEN):
+        if not hasattr(model, "step"):
+            raise TypeError("Streaming needs a causal model with step(); set model_config.MODEL_NAME = \"gru\"")
+        self.model = model
+        self.feature_norm_stats = feature_norm_stats
+        self.window = window
+        self.device = model_device(model)
+        self.store = HiddenStateStore(
+            num_layers=model.gru.num_layers,
+            hidden_size=model.gru.hidden_size,
+            capacity=capacity,
+            device=self.device,
+        )
+        self.last_pred = np.full((capacity, model.fc.out_features), np.nan, dtype=np.float32)
+        self.updates = 0
+        self.stale = 0
+
+    def update(self, mmsis, times, points):
+        """Advance each vessel by one new AIS point.
+
+        `mmsis` must be unique within a call; `times` are epoch seconds [B] and
+        `points` raw [B, 4] rows of [lat, lon, speed, course]. Points not newer
+        than the vessel's last one are ignored. Returns (preds, ready): the
+        latest next-point prediction per vessel [B, 5] in physical units and
+        whether it has seen at least `window` points. Batches larger than
+        the store capacity raise ValueError.
+        """
+        if len(set(mmsis)) != len(mmsis):
+            raise ValueError("update() takes at most one point per MMSI")
+        store = self.store
+        times = np.asarray(times, dtype=np.int64)
+        points = np.asarray(points, dtype=np.float64)
+        slots = store.assign([str(m) for m in mmsis])
+
+        fresh = (store.steps[slots] == 0) | (times > store.last_time[slots])
+        self.stale += int((~fresh).sum())
+        if fresh.any():
+            self._step(slots[fresh], times[fresh], points[fresh])
+
+        ready = store.steps[slots] >= self.window
+        return self.last_pred[slots].copy(), ready
+
+    def _step(self, slots, times, points):
+        store = self.store
+        # dist feature: metres from the vessel's previous point, 0 for its first one
+        dist = haversine_m(
+            *(torch.from_numpy(v) for v in (store.last_latlon[slots, 0], store.last_latlon[slots, 1], points[:, 0], points[:, 1]))
+        ).numpy()
+        dist[store.steps[slots] == 0] = 0.0
+        x = np.concatenate([points, dist[:, np.newaxis]], axis=1).astype(np.float32)
+        x = lat_lon_rate_transform(x)
+        if self.feature_norm_stats is not None:
+            x = norm(x, self.feature_norm_stats)
+
+        # Phase p restarts from zero before point n when n % (2 * window) == p * window,
+        # so after point n one phase has seen window..2 * window - 1 points: phase 0
+        # at cycle positions window - 1 .. 2 * window - 2, phase 1 otherwise
+        n = store.steps[slots]
+        cycle = n % (2 * self.window)
+        for phase in range(STREAM_PHASES):
+            restart = slots[cycle == phase * self.window]
+            if restart.size:
+                store.h[phase][:, torch.from_numpy(restart).to(self.device)] = 0.0
+        use_phase1 = ((cycle < self.window - 1) & (n >= self.window)) | (cycle == 2 * self.window - 1)
+        use_phase1 = torch.from_numpy(use_phase1).to(self.device)
+
+        index = torch.from_numpy(slots).to(self.device)
+        num_layers, batch = store.h.shape[1], len(slots)
+        with torch.no_grad():
+            # Both phases in one GRU step: [phases, layers, B, H] -> [layers, phases * B, H]
+            h_in = store.h.index_select(2, index).transpose(0, 1).reshape(num_layers, STREAM_PHASES * batch, -1)
+            x_in = torch.from_numpy(x).to(self.device).repeat(STREAM_PHASES, 1)
+            out, h = self.model.step(x_in, h_in)
+            store.h.index_copy_(2, index, h.reshape(num_layers, STREAM_PHASES, batch, -1).transpose(0, 1))
+            out = out.reshape(STREAM_PHASES, batch, -1)
+            out = torch.where(use_phase1[:, None], out[1], out[0])
+        pred = out.cpu().numpy()
+        if self.feature_norm_stats is not None:
+            pred = denorm(pred, self.feature_norm_stats)
+        self.last_pred[slots] = recover_next_lat_lon(pred)
+
+        store.last_latlon[slots] = points[:, :2]
+        store.last_time[slots] = times
+        store.steps[slots] += 1
+        self.updates += len(slots)
+
+    def predict(self, mmsi):
+        # Last prediction for one vessel without stepping; None if unknown or not ready
+        slot = self.store.slots.get(str(mmsi))
+        if slot is None or self.store.steps[slot] < self.window:
+            return None
+        return self.last_pred[slot].copy()
+
+    def last_time(self, mmsi):
+        # Epoch seconds of the newest point streamed for this vessel, None if unknown
+        slot = self.store.slots.get(str(mmsi))
+        return None if slot is None else int(self.store.last_time[slot])
+
+    def evict_idle(self, now, max_idle_s=STREAM_IDLE_S):
+        return self.store.evict_idle(now, max_idle_s)
+
+    def stats(self):
+        return {
+            "vessels": len(self.store),
+            "capacity": self.store.capacity,
+            "updates": self.updates,
+            "stale": self.stale,
+            "evictions": self.store.evictions,
+        }
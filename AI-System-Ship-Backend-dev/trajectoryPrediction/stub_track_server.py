@@ -0,0 +1,94 @@
+"""
+Local stand-in for the UIUX `/vesselTrack` API.
+
+Serves synthetic tracks in the same shape as src/routes/vesselTrack.js
+(newest point first, optional `since` filter), so the prediction path can be
+exercised and benchmarked without the real backend:
+
+    python stub_track_server.py  # then UIUX_API_BASE=http://127.0.0.1:8766/api/v1
+"""
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+HOST = "127.0.0.1"
+PORT = int(os.getenv("STUB_TRACK_PORT", "8766"))
+TRACK_POINTS = 200
+TRACK_START = datetime(2026, 2, 6, 0, 0, 0, tzinfo=timezone.utc)
+TRACK_INTERVAL_S = 60
+
+
+def synthetic_track(mmsi, n_points=TRACK_POINTS):
+    # Straight-line track seeded by MMSI so each vessel differs
+    seed = int(mmsi) % 1000 if str(mmsi).isdigit() else 0
+    lat0 = 22.0 + seed * 0.001
+    lon0 = 119.0 + seed * 0.001
+    track = []
+    for i in range(n_points):
+        ts = TRACK_START + timedelta(seconds=i * TRACK_INTERVAL_S)
+        track.append({
+            "coord": [lat0 + i * 0.002, lon0 + i * 0.003],
+            "timestamp": ts.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+            "sog": 12.0,
+            "cog": 56.0,
+            "heading": 56,
+            "navStatus": 0,
+        })
+    track.reverse()
+    return track
+
+
+def make_handler(n_points, delay_s=0.0):
+    class StubTrackHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            if delay_s:
+                # Simulated network/DB latency
+                time.sleep(delay_s)
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            mmsi = query.get("mmsi", [None])[0]
+            since = query.get("since", [None])[0]
+            if not url.path.endswith("/vesselTrack") or not mmsi:
+                status, payload = 404, {"error": "Vessel not found in AIS database"}
+            else:
+                status, payload = 200, synthetic_track(mmsi, n_points)
+                if since is not None:
+                    # ISO strings in the same format compare in time order
+                    payload = [p for p in payload if p["timestamp"] > since]
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubTrackHandler
+
+
+def start_stub_server(host=HOST, port=0, n_points=TRACK_POINTS, delay_s=0.0):
+    """Start the stub in a background thread; returns (server, api_base)."""
+    server = ThreadingHTTPServer((host, port), make_handler(n_points, delay_s))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    api_base = f"http://{host}:{server.server_address[1]}/api/v1"
+    return server, api_base
+
+
+if __name__ == "__main__":
+    server = ThreadingHTTPServer((HOST, PORT), make_handler(TRACK_POINTS))
+    print(f"Stub vesselTrack API on http://{HOST}:{PORT}/api/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -1,13 +1,12 @@
 import json
-import numpy as np
 import torch
 import torch.nn as nn
-from torch.utils.data import DataLoader
 from tqdm import tqdm
-from trajectoryPrediction.dataset import TrajectoryDataset
-from models.bigru import BiGRU
+from trajectoryPrediction.dataset import load_processed_dataset, make_loader
+from models.build import build_model
 from config import model_config
 from marineTraffic.preprocess import norm, denorm
+from rollout import haversine_m
 import os
 
 NORM_PATH = "marineTraffic/norm_stats.json"
@@ -24,19 +23,15 @@ else:
 batch_size = 64
 MODEL_NAME = model_config.MODEL_NAME
 model_path = f"savedModel/{MODEL_NAME}_best.pth"  # Pretrained model path
+int8_model_path = f"savedModel/{MODEL_NAME}_best_int8.pt"  # quantize_model.py output, evaluated if present
+INT8_MAX_LOSS_M = 50.0  # int8 平均位置誤差最多可比 fp32 多出的公尺數
 
 import os
-PROCESSED_DATA_PATH = 'marineTraffic/data.npz'
+PROCESSED_DATA_PATH = 'marineTraffic/data.npz'  # 或 dataset_store.py 轉出的資料夾 (memory-mapped)
 print(f"正在從 {PROCESSED_DATA_PATH} 載入預處理資料...")
-with np.load(PROCESSED_DATA_PATH) as data:
-    X_test = data['X_test']
-    y_test = data['y_test']
+test_dataset = load_processed_dataset(PROCESSED_DATA_PATH, "test")
 print("成功載入預處理資料。")
-print(f'測試樣本數: {len(X_test)}')
-
-# 1.5 先把資料搬到裝置（避免每個 batch 重複搬運）
-X_test = torch.tensor(X_test, dtype=torch.float32, device=device)
-y_test = torch.tensor(y_test, dtype=torch.float32, device=device)
+print(f'測試樣本數: {len(test_dataset)}')
 
 if not os.path.exists(NORM_PATH):
     raise FileNotFoundError(f"Normalization stats not found: {NORM_PATH}. Run marineTraffic/preprocess.py first.")
@@ -45,10 +40,9 @@ with open(NORM_PATH, "r", encoding="utf-8") as f:
 if "speed" not in norm_stats or "course" not in norm_stats:
     raise ValueError(f"Invalid normalization stats format in {NORM_PATH}. Expected keys: speed, course.")
 
-test_dataset = TrajectoryDataset(X_test, y_test)
-test_loader = DataLoader(test_dataset, batch_size=batch_size)
+test_loader = make_loader(test_dataset, batch_size)
 
-model = BiGRU().to(device)
+model = build_model(MODEL_NAME).to(device)
 criterion = nn.MSELoss()
 print("model device:", next(model.parameters()).device)
 
@@ -66,6 +60,8 @@ test_loss_norm = 0
 test_loss_denorm = 0
 with torch.no_grad():
     for X_batch, y_batch in tqdm(test_loader):
+        X_batch = X_batch.to(device)
+        y_batch = y_batch.to(device)
         output = model(X_batch)
         loss_norm = criterion(output, y_batch)
         output_denorm = denorm(output.clone(), norm_stats)
@@ -77,3 +73,32 @@ test_loss_norm /= len(test_loader.dataset)
 test_loss_denorm /= len(test_loader.dataset)
 print(f"Test Loss (normalized): {test_loss_norm:.6f}")
 print(f"Test Loss (denormalized): {test_loss_denorm:.6f}")
+
+# 8. 以公尺評估位置誤差（lat/lon 特徵為 lat/90、lon/180）
+def position_error_m(eval_model, loader, eval_device):
+    errors = []
+    with torch.no_grad():
+        for X_batch, y_batch in loader:
+            out = eval_model(X_batch.to(eval_device)).float().cpu()
+            target = y_batch.cpu()
+            errors.append(haversine_m(
+                out[:, 0].clamp(-1.0, 1.0) * 90.0,
+                out[:, 1].clamp(-1.0, 1.0) * 180.0,
+                target[:, 0] * 90.0,
+                target[:, 1] * 180.0,
+            ))
+    return torch.cat(errors)
+
+err_fp32 = position_error_m(model, test_loader, device)
+print(f"Position error fp32 (m): mean={err_fp32.mean().item():.1f}, p95={err_fp32.quantile(0.95).item():.1f}")
+
+# 9. int8 動態量化模型的精度損失（僅在 CPU 上執行）
+if os.path.exists(int8_model_path):
+    int8_model = torch.jit.load(int8_model_path, map_location="cpu")
+    int8_model.eval()
+    err_int8 = position_error_m(int8_model, test_loader, torch.device("cpu"))
+    loss_m = err_int8.mean().item() - err_fp32.mean().item()
+    print(f"Position error int8 (m): mean={err_int8.mean().item():.1f}, p95={err_int8.quantile(0.95).item():.1f}")
+    print(f"int8 accuracy loss: {loss_m:+.1f} m (bound {INT8_MAX_LOSS_M:.1f} m)")
+    if loss_m > INT8_MAX_LOSS_M:
+        raise RuntimeError(f"int8 model loses {loss_m:.1f} m of accuracy, above INT8_MAX_LOSS_M={INT8_MAX_LOSS_M}")
@@ -0,0 +1,35 @@
+import threading
+
+import numpy as np
+import pytest
+
+from predict_batcher import MicroBatcher
+
+
+def test_cancelled_request_does_not_break_the_batch():
+    release = threading.Event()
+
+    def batch_fn(x):
+        release.wait(5)
+        return x * 2
+
+    batcher = MicroBatcher(batch_fn, max_batch_size=4, max_wait_ms=50)
+    try:
+        first = batcher.submit(np.ones(2))  # blocks the worker in batch_fn
+        cancelled = batcher.submit(np.full(2, 3.0))
+        other = batcher.submit(np.full(2, 5.0))
+        assert cancelled.cancel()
+        release.set()
+        np.testing.assert_array_equal(first.result(timeout=5), [2, 2])
+        np.testing.assert_array_equal(other.result(timeout=5), [10, 10])
+    finally:
+        release.set()
+        batcher.close()
+
+
+def test_submit_after_close_fails():
+    batcher = MicroBatcher(lambda x: x, max_wait_ms=1)
+    np.testing.assert_array_equal(batcher.submit(np.ones(2)).result(timeout=5), [1, 1])
+    batcher.close()
+    with pytest.raises(RuntimeError):
+        batcher.submit(np.ones(2)).result(timeout=5)
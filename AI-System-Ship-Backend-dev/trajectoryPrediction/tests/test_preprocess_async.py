@@ -0,0 +1,52 @@
+import asyncio
+
+import numpy as np
+
+from marineTraffic import preprocess as pp
+from marineTraffic import preprocess_async as pa
+
+
+def make_columns(vessels=50, points=3 * pp.SEQ_LEN):
+    rng = np.random.default_rng(0)
+    n = vessels * points
+    return {
+        "mmsi": np.repeat([str(412000000 + v) for v in range(vessels)], points),
+        "t": np.tile(1770000000 + 60 * np.arange(points), vessels).astype(np.int64),
+        "lat": 25 + rng.normal(0, 1e-2, n),
+        "lon": 121 + rng.normal(0, 1e-2, n),
+        "speed": rng.uniform(0, 200, n),
+        "course": rng.uniform(0, 360, n),
+    }
+
+
+def test_parse_snapshot_batch_filters_like_the_db_match():
+    # Only the exact SHIPTYPE value matches, as {"data.SHIPTYPE": "70"} does
+    point = {"MMSI": "1", "LAT": "25", "LON": "121", "SPEED": "1", "COURSE": "2", "TIMESTAMP": "2026-02-06T08:00:00"}
+    docs = [{"data": [
+        {**point, "SHIPTYPE": "70"},
+        {**point, "MMSI": "2", "SHIPTYPE": 70},
+        {**point, "MMSI": "3", "shiptype": "70"},
+        {**point, "MMSI": "4", "SHIPTYPE": "30"},
+    ]}]
+    columns, _ = pa.parse_snapshot_batch(docs, "70")
+    assert list(columns["mmsi"]) == ["1"]
+
+
+def test_save_writes_the_preprocess_layout(tmp_path, monkeypatch):
+    async def fake_load(**kwargs):
+        return make_columns(), {"70": 1}, None
+
+    monkeypatch.setattr(pa, "load_track_columns_async", fake_load)
+    monkeypatch.setattr(pp, "OUTPUT_NPZ", str(tmp_path / "data.npz"))
+    monkeypatch.setattr(pp, "NORM_STATS_JSON", str(tmp_path / "norm_stats.json"))
+    asyncio.run(pa.run_async_preprocess(save=True))
+
+    columns, mmsis, offsets = pp.sort_track_columns(make_columns())
+    trajectories, traj_vessel, _ = pp.build_track_trajectories(columns, offsets)
+    train_trajs, test_trajs = pp.split_trajectories_by_vessel(trajectories, traj_vessel, mmsis)
+    expected, _, _ = pp.build_dataset_arrays(train_trajs, test_trajs)
+    pp.normalize_dataset_arrays(expected, pp.trajectory_feature_stats(train_trajs).to_feature_stats())
+    with np.load(tmp_path / "data.npz") as data:
+        assert sorted(data.files) == sorted(expected)
+        for name, arr in expected.items():
+            np.testing.assert_array_equal(data[name], arr)
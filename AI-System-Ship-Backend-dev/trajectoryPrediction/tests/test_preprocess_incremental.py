@@ -0,0 +1,62 @@
+import zipfile
+
+import numpy as np
+
+from marineTraffic import preprocess as pp
+from marineTraffic import preprocess_incremental as inc
+from utils.windowing import TrajectoryWindows
+
+
+def make_raw(vessels=200, points=3 * pp.SEQ_LEN):
+    rng = np.random.default_rng(0)
+    rows = []
+    for v in range(vessels):
+        lat, lon = 25 + rng.normal(), 121 + rng.normal()
+        for k in range(points):
+            rows.append((str(412000000 + v), f"2026-02-06T08:{k:02d}:00", lat + 1e-3 * k, lon, 100.0 + k, float(k % 360)))
+    return np.array(rows, dtype=inc.RAW_DTYPE)
+
+
+def window_rows(points, starts):
+    # Each window (inputs + target) as bytes, order-free
+    return sorted(points[s:s + pp.SEQ_LEN + 1].tobytes() for s in starts)
+
+
+def test_shards_match_preprocess_split_and_stats():
+    raw = make_raw()
+    raw = raw[np.lexsort((raw["ts"], raw["mmsi"]))]
+
+    # preprocess.main() path
+    columns = {name: raw[name] for name in ("mmsi", "lat", "lon", "speed", "course")}
+    columns["t"] = pp.parse_timestamps(raw["ts"])
+    columns, mmsis, offsets = pp.sort_track_columns(columns)
+    trajectories, traj_vessel, _ = pp.build_track_trajectories(columns, offsets)
+    train_trajs, test_trajs = pp.split_trajectories_by_vessel(trajectories, traj_vessel, mmsis)
+    expected = {"train": TrajectoryWindows(train_trajs, pp.SEQ_LEN), "test": TrajectoryWindows(test_trajs, pp.SEQ_LEN)}
+    assert len(expected["train"]) and len(expected["test"])
+
+    # Incremental shards
+    shard = np.array([inc.shard_of(m) for m in raw["mmsi"]])
+    got = {split: [] for split in inc.SPLITS}
+    stats = pp.RunningStats()
+    for s in np.unique(shard):
+        for split, (points, starts) in inc.build_shard_windows(raw[shard == s]).items():
+            got[split] += window_rows(points, starts)
+            if split == "train":
+                stats.merge(inc.shard_feature_stats(points, starts))
+
+    for split in inc.SPLITS:
+        assert sorted(got[split]) == window_rows(expected[split].buffer, expected[split].starts)
+    want = pp.trajectory_feature_stats(train_trajs).to_feature_stats()
+    for name, values in stats.to_feature_stats().items():
+        np.testing.assert_allclose([values["mean"], values["std"]], [want[name]["mean"], want[name]["std"]], rtol=1e-6)
+
+
+def test_save_npz_has_fixed_timestamps(tmp_path):
+    arrays = {"train_points": np.arange(10, dtype=np.float32).reshape(5, 2), "seq_len": pp.SEQ_LEN}
+    pp.save_npz(tmp_path / "a.npz", **arrays)
+    with zipfile.ZipFile(tmp_path / "a.npz") as zf:
+        assert {info.date_time for info in zf.infolist()} == {(1980, 1, 1, 0, 0, 0)}
+    data = np.load(tmp_path / "a.npz")
+    np.testing.assert_array_equal(data["train_points"], arrays["train_points"])
+    assert int(data["seq_len"]) == pp.SEQ_LEN
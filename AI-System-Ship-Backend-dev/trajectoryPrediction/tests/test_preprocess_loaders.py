@@ -0,0 +1,64 @@
+"""Loader parity against a scratch MongoDB database.
+
+Set TEST_MONGO_URL (e.g. mongodb://127.0.0.1:27017) to run; the database
+is dropped afterwards.
+"""
+import os
+
+import numpy as np
+import pytest
+
+import database
+from marineTraffic import preprocess as pp
+
+TEST_MONGO_URL = os.getenv("TEST_MONGO_URL")
+TEST_DB = "test_preprocess_loaders"
+
+pytestmark = pytest.mark.skipif(not TEST_MONGO_URL, reason="TEST_MONGO_URL not set")
+
+
+def seed(col, snapshots=20, vessels=30):
+    # Every third snapshot has no SHIPTYPE_FILTER points, so skipping
+    # before or after the SHIPTYPE filter reads different snapshots
+    col.drop()
+    for snap in range(snapshots):
+        shiptype = "30" if snap % 3 == 0 else "70"
+        col.insert_one({"data": [
+            {
+                "MMSI": str(412000000 + v),
+                "LAT": f"{25 + v * 1e-2 + snap * 1e-3:.6f}",
+                "LON": f"{121 + snap * 1e-3:.6f}",
+                "SPEED": str(100 + v),
+                "COURSE": str((v + snap) % 360),
+                "TIMESTAMP": f"2026-02-06T08:{snap:02d}:00",
+                "SHIPTYPE": shiptype,
+            }
+            for v in range(vessels)
+        ]})
+
+
+@pytest.fixture()
+def collection(monkeypatch):
+    monkeypatch.setattr(database, "MONGO_URL", TEST_MONGO_URL)
+    monkeypatch.setattr(pp, "DB_NAME", TEST_DB)
+    monkeypatch.setattr(pp, "SHIPTYPE_FILTER", "70")
+    monkeypatch.setattr(pp, "DB_SKIP_DOCS", 4)
+    col = database.get_db(TEST_DB)[pp.COLLECTION_NAME]
+    seed(col)
+    yield col
+    database.get_client().drop_database(TEST_DB)
+
+
+def test_raw_loader_matches_point_pipeline(collection):
+    points, point_counts, n_points = pp.load_track_columns_from_db()
+    raw, raw_counts, n_raw = pp.load_raw_track_columns_from_db()
+    assert n_raw == n_points > 0
+    for name in pp.TRACK_COLUMNS:
+        np.testing.assert_array_equal(raw[name], points[name])
+    assert raw_counts == point_counts
+
+
+def test_raw_loader_skips_before_shiptype_filter(collection):
+    # Snapshots 0-3 are skipped; skipping 4 SHIPTYPE 70 snapshots instead (1, 2, 4, 5) would start at 7
+    raw, _, _ = pp.load_raw_track_columns_from_db()
+    assert raw["t"].min() == np.datetime64("2026-02-06T08:04:00", "s").astype(np.int64)
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+import torch
+
+from marineTraffic.preprocess import append_step_distance_feature, lat_lon_rate_transform, recover_next_lat_lon
+from models.gru import CausalGRU
+from streaming import StreamingPredictor
+
+WINDOW = 4
+
+
+def make_tracks(vessels=3, points=5 * WINDOW):
+    rng = np.random.default_rng(0)
+    lat = 25 + np.cumsum(rng.normal(0, 1e-2, (vessels, points)), axis=1)
+    lon = 121 + np.cumsum(rng.normal(0, 1e-2, (vessels, points)), axis=1)
+    speed = rng.uniform(0, 200, (vessels, points))
+    course = rng.uniform(0, 360, (vessels, points))
+    # float32-representable, so both paths see the same coordinates
+    return np.stack([lat, lon, speed, course], axis=-1).astype(np.float32).astype(np.float64)
+
+
+def window_predictions(model, track, end):
+    # Window path: the last WINDOW points up to `end`, from a zero state
+    feats = lat_lon_rate_transform(append_step_distance_feature(track[:end + 1].astype(np.float32)))
+    with torch.no_grad():
+        out = model(torch.from_numpy(feats[None, -WINDOW:]))
+    return recover_next_lat_lon(out.numpy())[0]
+
+
+def test_streaming_matches_window_every_window_steps():
+    torch.manual_seed(0)
+    model = CausalGRU(input_size=5, hidden_size=16, num_layers=2, output_size=5).eval()
+    tracks = make_tracks()
+    streamer = StreamingPredictor(model, window=WINDOW)
+    mmsis = [str(412000000 + v) for v in range(tracks.shape[0])]
+    for n in range(tracks.shape[1]):
+        preds, ready = streamer.update(mmsis, np.full(len(mmsis), 1000 + 60 * n), tracks[:, n])
+        assert ready.all() == (n >= WINDOW - 1)
+        if n >= WINDOW - 1 and (n + 1) % WINDOW == 0:
+            for v in range(tracks.shape[0]):
+                np.testing.assert_allclose(preds[v], window_predictions(model, tracks[v], n), rtol=1e-5, atol=1e-5)
+
+
+def test_batch_larger_than_capacity_raises():
+    model = CausalGRU(input_size=5, hidden_size=8, num_layers=1, output_size=5).eval()
+    streamer = StreamingPredictor(model, capacity=2, window=WINDOW)
+    with pytest.raises(ValueError):
+        streamer.update(["1", "2", "3"], [0, 0, 0], np.zeros((3, 4)))
+    # A full store still takes a new batch that fits by evicting idle vessels
+    streamer.update(["1", "2"], [0, 0], np.zeros((2, 4)))
+    streamer.update(["3", "4"], [60, 60], np.zeros((2, 4)))
+    assert streamer.stats()["evictions"] == 2
+
+
+def test_stream_tracks_needs_capacity_for_the_fleet():
+    from precompute_predictions import stream_tracks
+
+    model = CausalGRU(input_size=5, hidden_size=8, num_layers=1, output_size=5).eval()
+    tracks = make_tracks(vessels=3, points=WINDOW)
+    fleet = {
+        str(412000000 + v): [(f"2026-02-06T08:{n:02d}:00", *tracks[v, n]) for n in range(WINDOW)]
+        for v in range(tracks.shape[0])
+    }
+    with pytest.raises(ValueError):
+        stream_tracks(StreamingPredictor(model, capacity=2, window=WINDOW), fleet)
+    streamer = StreamingPredictor(model, capacity=3, window=WINDOW)
+    mmsis, _, preds = stream_tracks(streamer, fleet)
+    assert sorted(mmsis) == sorted(fleet) and preds.shape == (3, 5)
+    # Nothing newer on the next cycle: no state was lost, nothing is re-fed
+    assert stream_tracks(streamer, fleet)[0] == []
+    assert streamer.stats()["updates"] == 3 * WINDOW
@@ -0,0 +1,173 @@
+"""
+Incremental per-vessel track sync for the prediction path.
+
+The first fetch of a vessel downloads its track from /vesselTrack. Later
+refreshes ask only for points newer than the last seen timestamp
+(`since`), so refresh cost follows the amount of new data rather than the
+track length. Points are kept in time order in a fixed-size ring buffer
+of the most recent `ring_size` rows of [lat, lon, speed, course, dist].
+"""
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+import numpy as np
+
+from load_trajectories import fetch_trajectories_via_api
+from marineTraffic.preprocess import append_step_distance_feature
+
+TRACK_RING_SIZE = 256
+TRACK_SYNC_MAX_VESSELS = 4096
+
+
+def _parse_timestamp(ts):
+    try:
+        dt = datetime.fromisoformat(str(ts))
+    except (TypeError, ValueError):
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+
+def extract_track(track, prev_point=None):
+    """Parse /vesselTrack entries into time-sorted arrays.
+
+    Returns (times, timestamps, points): epoch seconds [N], the raw
+    timestamp strings [N] and [N, 5] rows of [lat, lon, speed, course, dist].
+    The API returns newest first; output is oldest first. `prev_point` is the
+    last row already held for this vessel, so the first new point's distance
+    is measured from it instead of being 0.
+    """
+    rows = []
+    for e in track:
+        if not isinstance(e, dict):
+            continue
+        lat = None
+        lon = None
+        coord = e.get("coord")
+        if coord and len(coord) >= 2:
+            lat, lon = coord[0], coord[1]
+        speed = e.get("sog", e.get("SPEED", 0))
+        course = e.get("cog", e.get("COURSE", 0))
+        ts = e.get("timestamp", e.get("TIMESTAMP"))
+        t = _parse_timestamp(ts)
+        if lat is None or lon is None or t is None:
+            continue
+        rows.append((t, ts, float(lat), float(lon), float(speed or 0), float(course or 0)))
+    rows.sort(key=lambda r: r[0])
+
+    times = np.array([r[0] for r in rows], dtype=np.int64)
+    timestamps = [r[1] for r in rows]
+    arr = np.array([r[2:] for r in rows], dtype=np.float32).reshape(-1, 4)
+    if prev_point is None:
+        return times, timestamps, append_step_distance_feature(arr)
+    arr = np.concatenate([prev_point[np.newaxis, :4], arr], axis=0)
+    return times, timestamps, append_step_distance_feature(arr)[1:]
+
+
+class TrackRing(object):
+    """Fixed-capacity ring buffer of the most recent track points."""
+
+    def __init__(self, capacity=TRACK_RING_SIZE, n_features=5):
+        self.capacity = capacity
+        self.buf = np.zeros((capacity, n_features), dtype=np.float32)
+        self.head = 0  # next write position
+        self.count = 0
+
+    def extend(self, points):
+        n = points.shape[0]
+        if n == 0:
+            return
+        if n > self.capacity:
+            points = points[-self.capacity:]
+            n = self.capacity
+        idx = (self.head + np.arange(n)) % self.capacity
+        self.buf[idx] = points
+        self.head = (self.head + n) % self.capacity
+        self.count = min(self.count + n, self.capacity)
+
+    def latest(self, n=None):
+        # Oldest-first copy of the last n points
+        n = self.count if n is None else min(n, self.count)
+        idx = (self.head - n + np.arange(n)) % self.capacity
+        return self.buf[idx]
+
+    def last(self):
+        return self.buf[(self.head - 1) % self.capacity] if self.count else None
+
+
+class _TrackEntry(object):
+    def __init__(self, ring_size):
+        self.ring = TrackRing(ring_size)
+        self.last_time = None
+        self.last_timestamp = None
+        self.lock = threading.Lock()
+
+
+class TrackSync(object):
+    def __init__(self, ring_size=TRACK_RING_SIZE, max_vessels=TRACK_SYNC_MAX_VESSELS, fetch_fn=None):
+        self.ring_size = ring_size
+        self.max_vessels = max_vessels
+        self.fetch_fn = fetch_trajectories_via_api if fetch_fn is None else fetch_fn
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.full_fetches = 0
+        self.incremental_fetches = 0
+        self.points_fetched = 0
+
+    def _entry(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = _TrackEntry(self.ring_size)
+                self._entries[key] = entry
+                while len(self._entries) > self.max_vessels:
+                    self._entries.popitem(last=False)
+            self._entries.move_to_end(key)
+            return entry
+
+    def refresh(self, mmsi, n=None):
+        """Pull new points for `mmsi`.
+
+        Returns (last_time, points): epoch seconds of the newest point (None
+        if there are none) and the last `n` points, oldest first.
+        """
+        entry = self._entry(str(mmsi))
+        with entry.lock:
+            if entry.last_timestamp is None:
+                data = self.fetch_fn(mmsi)
+                full = True
+            else:
+                data = self.fetch_fn(mmsi, since=entry.last_timestamp)
+                full = False
+            times, timestamps, points = extract_track(data, prev_point=entry.ring.last())
+            if entry.last_time is not None:
+                # Guard against servers that ignore `since`
+                keep = times > entry.last_time
+                times = times[keep]
+                timestamps = [ts for ts, k in zip(timestamps, keep) if k]
+                points = points[keep]
+            entry.ring.extend(points)
+            if times.size:
+                entry.last_time = int(times[-1])
+                entry.last_timestamp = timestamps[-1]
+            points = entry.ring.latest(n)
+            last_time = entry.last_time
+        with self._lock:
+            if full:
+                self.full_fetches += 1
+            else:
+                self.incremental_fetches += 1
+            self.points_fetched += len(data)
+        return last_time, points
+
+    def stats(self):
+        with self._lock:
+            return {
+                "vessels": len(self._entries),
+                "ring_size": self.ring_size,
+                "full_fetches": self.full_fetches,
+                "incremental_fetches": self.incremental_fetches,
+                "points_fetched": self.points_fetched,
+            }
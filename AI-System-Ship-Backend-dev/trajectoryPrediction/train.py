@@ -1,12 +1,10 @@
 import torch
 import torch.nn as nn
-from torch.utils.data import DataLoader
 from tqdm import tqdm
 import time
 import os
 import sys
 from pathlib import Path
-import numpy as np
 
 # Ensure project root is on sys.path for local imports.
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
@@ -14,14 +12,14 @@ if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
 
 from utils.utils import print_macos_gpu_info
-from trajectoryPrediction.dataset import TrajectoryDataset
-from models.bigru import BiGRU
+from trajectoryPrediction.dataset import load_processed_dataset, make_loader
+from models.build import build_model
 from config import model_config
 from marineTraffic.preprocess import main as run_preprocess
 
 # USER SETTINGS
 PROCESS_DATA = False  # 是否重新處理數據
-PROCESSED_DATA_PATH = "marineTraffic/data.npz"
+PROCESSED_DATA_PATH = "marineTraffic/data.npz"  # 或 dataset_store.py 轉出的資料夾 (memory-mapped)
 BATCH_SIZE = 16
 NUM_EPOCHS = 50
 LEARNING_RATE = 1e-3
@@ -53,29 +51,21 @@ if PROCESS_DATA:
     print("Running preprocessing...")
     run_preprocess()
 print(f"Loading {PROCESSED_DATA_PATH} ")
-with np.load(PROCESSED_DATA_PATH) as data:
-    X_train = data['X_train']
-    y_train = data['y_train']
-print(f'X shape: {X_train.shape}, y shape: {y_train.shape}')
-print(X_train[:5], y_train[:5])  # Debug: print first 5 samples
-
-train_dataset = TrajectoryDataset(X_train, y_train)
-train_loader = DataLoader(train_dataset, batch_size=BATCH_SIZE, shuffle=True)
+train_dataset = load_processed_dataset(PROCESSED_DATA_PATH, "train")
+X_sample, y_sample = train_dataset[0]
+print(f'Train samples: {len(train_dataset)}, X shape: {tuple(X_sample.shape)}, y shape: {tuple(y_sample.shape)}')
 
 # Device
 DATA_ON_DEVICE = device.type != "cpu"
 if DATA_ON_DEVICE:
-    X_train = torch.tensor(X_train, dtype=torch.float32, device=device)
-    y_train = torch.tensor(y_train, dtype=torch.float32, device=device)
+    # Dense X/y or lazy window points: keep them on the device and batch there
+    train_dataset.to(device)
+
+train_loader = make_loader(train_dataset, BATCH_SIZE, shuffle=True)
 
 model_path = f"savedModel/{MODEL_NAME}.pth"  # 若有預訓練模型，可指定路徑
 best_model_path = f"savedModel/{MODEL_NAME}_best.pth"
-model = BiGRU(
-    input_size=MODEL_INPUT_SIZE,
-    hidden_size=MODEL_HIDDEN_SIZE,
-    num_layers=MODEL_NUM_LAYERS,
-    output_size=MODEL_OUTPUT_SIZE,
-).to(device)
+model = build_model(MODEL_NAME).to(device)
 
 if os.path.exists(model_path):
     try:
@@ -5,6 +5,7 @@ import torch
 import torch.nn.functional as F
 from tqdm import tqdm
 from torch.nn.utils.rnn import pad_sequence
+from utils.windowing import window_starts
 
 # Collate function for variable-length AIS sequences
 def collate_ais(batch):
@@ -22,16 +23,14 @@ def collate_ais(batch):
 
 # Split a trajectory into sliding windows (seq_len -> next)
 def split_trajectory_windows(inputs, targets, seq_len=5, stride=1):
-    windows = []
-    total = inputs.size(0)
-    end = total - seq_len
-    if end <= 0:
-        return windows
-    for start in range(0, end, stride):
-        x = inputs[start:start + seq_len]
-        y = targets[start + seq_len]
-        windows.append((x, y))
-    return windows
+    _, starts = window_starts([inputs.size(0)], seq_len, stride)
+    n = starts.shape[0]
+    if n == 0:
+        return []
+    # unfold is a view: [n, seq_len, F] windows without copying
+    xs = inputs.unfold(0, seq_len, stride)[:n].transpose(1, 2)
+    ys = targets[seq_len:seq_len + n * stride:stride]
+    return list(zip(xs.unbind(0), ys.unbind(0)))
 
 def convertShipTypeToName(shipType):
     
@@ -233,14 +232,8 @@ class AISDataset(torch.utils.data.Dataset):
         # Build sliding-window index if seq_len is provided
         self.window_index = None
         if self.seq_len is not None:
-            self.window_index = []
-            for idx, length in enumerate(self.lengths.tolist()):
-                # Need at least seq_len + 1 to predict next step
-                max_start = length - self.seq_len - 1
-                if max_start < 0:
-                    continue
-                for start in range(0, max_start + 1, self.stride):
-                    self.window_index.append((idx, start))
+            # [M, 2] rows of (track index, window start); needs seq_len + 1 points to predict next step
+            self.window_index = np.stack(window_starts(self.lengths.numpy(), self.seq_len, self.stride), axis=1)
             self.datasetN = len(self.window_index)
         
         if 'outlierLabels' in self.params.keys():
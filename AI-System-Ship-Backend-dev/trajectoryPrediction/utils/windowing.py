@@ -0,0 +1,80 @@
+"""
+Sliding-window engine for next-step training data.
+
+All trajectories are concatenated into one [N, F] buffer with an offsets
+array (track i is buffer[offsets[i]:offsets[i + 1]]). Window k covers
+buffer[starts[k]:starts[k] + seq_len] and its target is the row right after
+it. Windows are read through numpy's sliding_window_view, so nothing is
+copied until inputs()/targets()/materialize() is called for a set of
+windows.
+"""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def concat_trajectories(trajs, n_features=0):
+    """[T_i, F] arrays -> (buffer [sum T_i, F], offsets [len(trajs) + 1]).
+
+    With no trajectories the buffer is [0, n_features], so callers can still
+    index feature columns.
+    """
+    lengths = np.array([t.shape[0] for t in trajs], dtype=np.int64)
+    offsets = np.zeros(len(trajs) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    if not trajs:
+        return np.zeros((0, n_features), dtype=np.float32), offsets
+    return np.concatenate(trajs, axis=0), offsets
+
+
+def window_starts(lengths, seq_len, stride=1):
+    """Every (track, start) with a full window and a next-step target.
+
+    Starts run over range(0, length - seq_len, stride) per track. Returns
+    (track_ids, starts) as int64 arrays, ordered by track then start.
+    """
+    lengths = np.asarray(lengths, dtype=np.int64)
+    counts = np.maximum(0, (lengths - seq_len + stride - 1) // stride)
+    track_ids = np.repeat(np.arange(lengths.shape[0], dtype=np.int64), counts)
+    first = np.cumsum(counts) - counts
+    starts = (np.arange(counts.sum(), dtype=np.int64) - np.repeat(first, counts)) * stride
+    return track_ids, starts
+
+
+def window_coverage(n_rows, starts, seq_len):
+    # Number of windows whose input covers each of the n_rows buffer rows
+    delta = np.bincount(starts, minlength=n_rows + 1)[:n_rows + 1]
+    delta -= np.bincount(starts + seq_len, minlength=n_rows + 1)[:n_rows + 1]
+    return np.cumsum(delta[:n_rows])
+
+
+class TrajectoryWindows(object):
+    def __init__(self, trajs, seq_len, stride=1, n_features=0):
+        self.seq_len = seq_len
+        self.buffer, self.offsets = concat_trajectories(trajs, n_features)
+        self.track_ids, local_starts = window_starts(np.diff(self.offsets), seq_len, stride)
+        # Window starts as row positions in buffer
+        self.starts = self.offsets[self.track_ids] + local_starts
+
+    def __len__(self):
+        return self.starts.shape[0]
+
+    def view(self):
+        # Zero-copy [N - seq_len + 1, seq_len, F]: row s is the window starting at buffer row s
+        if self.buffer.shape[0] < self.seq_len:
+            return np.zeros((0, self.seq_len, self.buffer.shape[1]), dtype=self.buffer.dtype)
+        return sliding_window_view(self.buffer, self.seq_len, axis=0).transpose(0, 2, 1)
+
+    def inputs(self, idx=None):
+        starts = self.starts if idx is None else self.starts[idx]
+        return self.view()[starts]
+
+    def targets(self, idx=None):
+        starts = self.starts if idx is None else self.starts[idx]
+        return self.buffer[starts + self.seq_len]
+
+    def materialize(self):
+        # (X [M, seq_len, F], y [M, F]) as dense arrays
+        return self.inputs(), self.targets()
+
+    def coverage(self):
+        return window_coverage(self.buffer.shape[0], self.starts, self.seq_len)